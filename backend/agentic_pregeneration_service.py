@@ -4,17 +4,23 @@ Intelligently predicts and pre-generates questions based on user patterns
 """
 
 import asyncio
-from typing import List, Dict, Optional, Tuple
-from datetime import datetime, timedelta
-from collections import Counter
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+import functools
+import logging
+import os
+import time
+from typing import ClassVar, List, Dict, Optional, Set, Tuple
+from datetime import timedelta
+from collections import Counter, OrderedDict
+from sqlalchemy import desc, func, select
+from aiolimiter import AsyncLimiter
 
-from database import get_db, ExamAttempt, User
-from rag_service import RAGAgent
+from database import AsyncSessionLocal, ExamAttempt, User, utcnow
+from rag_service import get_rag
 from question_cache_service import get_cache_service
 from model_service import ModelService
 
+logger = logging.getLogger(__name__)
+
 
 class AgenticPreGenerationAgent:
     """
@@ -22,63 +28,107 @@ class AgenticPreGenerationAgent:
     questions to minimize cache misses
     """
     
+    # Common exam configurations to always keep cached
+    PRIORITY_CONFIGS: ClassVar[Tuple[Tuple[str, str, int, str], ...]] = (
+        # IIT JEE - Most popular
+        ("Mathematics", "Medium", 30, "IIT_JEE"),
+        ("Physics", "Medium", 30, "IIT_JEE"),
+        ("Chemistry", "Medium", 30, "IIT_JEE"),
+        ("Mathematics", "Hard", 30, "IIT_JEE"),
+        ("Physics", "Hard", 30, "IIT_JEE"),
+        
+        # NEET - Second most popular
+        ("Physics", "Medium", 45, "NEET"),
+        ("Chemistry", "Medium", 45, "NEET"),
+        ("Biology", "Medium", 45, "NEET"),
+        
+        # Practice sets
+        ("Mathematics", "Easy", 10, "IIT_JEE"),
+        ("Physics", "Easy", 10, "IIT_JEE"),
+    )
+    
+    # Adaptive scheduling for run_periodic_pregeneration
+    TARGET_HIT_RATE = 70
+    SKIP_PREDICTION_HIT_RATE = 95
+    HIT_RATE_EMA_ALPHA = 0.3
+    MIN_PREGENERATION_INTERVAL_SECONDS = 300
+    
+    # Negative cache for configs whose generation recently failed
+    FAILURE_TTL_SECONDS = 300
+    MAX_RECENT_FAILURES = 256
+    
     def __init__(self):
-        self.rag_agent = RAGAgent()
         self.cache_service = get_cache_service()
         self.model_service = ModelService()
         
-        # Common exam configurations to always keep cached
-        self.priority_configs = [
-            # IIT JEE - Most popular
-            ("Mathematics", "Medium", 30, "IIT_JEE"),
-            ("Physics", "Medium", 30, "IIT_JEE"),
-            ("Chemistry", "Medium", 30, "IIT_JEE"),
-            ("Mathematics", "Hard", 30, "IIT_JEE"),
-            ("Physics", "Hard", 30, "IIT_JEE"),
-            
-            # NEET - Second most popular
-            ("Physics", "Medium", 45, "NEET"),
-            ("Chemistry", "Medium", 45, "NEET"),
-            ("Biology", "Medium", 45, "NEET"),
-            
-            # Practice sets
-            ("Mathematics", "Easy", 10, "IIT_JEE"),
-            ("Physics", "Easy", 10, "IIT_JEE"),
-        ]
+        # Priority configs never change, so resolve their cache keys once
+        self._key_by_config: Dict[Tuple, str] = {
+            config: self.cache_service.generate_cache_key(*config)
+            for config in self.PRIORITY_CONFIGS
+        }
+        
+        # Cache keys currently being generated, so concurrent predictions
+        # for the same config collapse into a single generation
+        self._inflight: Set[str] = set()
+        
+        # Token bucket for generation requests (LLM_RATE per second) replaces
+        # the old fixed sleep between batches
+        self._limiter = AsyncLimiter(int(os.getenv("LLM_RATE", "10")), 1)
+        
+        # Caps concurrent generations from every entry point (scheduler,
+        # request-triggered variants) so a burst can't flood the provider
+        self._generation_slots = asyncio.Semaphore(int(os.getenv("PREGEN_CONCURRENCY", "4")))
+        
+        # Negative cache of recently failed cache keys -> failure timestamp
+        self._recent_failures: "OrderedDict[str, float]" = OrderedDict()
+        
+        # Smoothed cache hit rate driving the periodic scheduler
+        self._hit_ema: Optional[float] = None
     
-    async def analyze_user_patterns(self, db: Session, days: int = 7) -> List[Tuple]:
+    async def analyze_user_patterns(self, days: int = 7) -> List[Tuple]:
         """
         Analyze exam attempts from last N days to find popular patterns
         Returns list of (subject, difficulty, count, exam_type) tuples
         """
         try:
             # Get date threshold
-            threshold = datetime.utcnow() - timedelta(days=days)
+            threshold = utcnow() - timedelta(days=days)
+            
+            logger.info("Analyzing user patterns from last %d days", days)
             
-            # Query exam attempts (simplified - you'll need to add subject/difficulty tracking)
-            # For now, return priority configs
-            print(f"📊 Analyzing user patterns from last {days} days...")
+            # Aggregate in the database (backed by the ix_attempts_time_subj_diff index)
+            stmt = select(
+                ExamAttempt.subject,
+                ExamAttempt.difficulty,
+                ExamAttempt.total_questions,
+                func.count(ExamAttempt.attempt_id).label('c')
+            ).where(
+                ExamAttempt.start_time >= threshold,
+                ExamAttempt.subject.is_not(None),
+                ExamAttempt.difficulty.is_not(None)
+            ).group_by(
+                ExamAttempt.subject,
+                ExamAttempt.difficulty,
+                ExamAttempt.total_questions
+            ).order_by(desc('c')).limit(20)
+            # Async session so the query doesn't block the event loop; it is
+            # closed before pre-generation starts so no connection is held
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(stmt)).all()
             
-            # TODO: When you add subject/difficulty to ExamAttempt table, use this:
-            # attempts = db.query(
-            #     ExamAttempt.subject,
-            #     ExamAttempt.difficulty,
-            #     ExamAttempt.total_questions,
-            #     func.count(ExamAttempt.attempt_id).label('count')
-            # ).filter(
-            #     ExamAttempt.start_time >= threshold
-            # ).group_by(
-            #     ExamAttempt.subject,
-            #     ExamAttempt.difficulty,
-            #     ExamAttempt.total_questions
-            # ).order_by(desc('count')).limit(20).all()
+            # Attempts don't record the exam type, so observed patterns use
+            # the general (exam_type=None) cache key
+            observed = [
+                (row.subject, row.difficulty, row.total_questions, None)
+                for row in rows
+            ]
             
-            # For now, return priority configs
-            return self.priority_configs
+            # Most popular first, then priority configs not already seen
+            return list(dict.fromkeys(observed + list(self.PRIORITY_CONFIGS)))
             
         except Exception as e:
-            print(f"⚠️  Pattern analysis error: {e}")
-            return self.priority_configs
+            logger.warning("Pattern analysis error: %s", e)
+            return list(self.PRIORITY_CONFIGS)
     
     async def predict_next_requests(self, current_hour: int, current_day: int) -> List[Tuple]:
         """
@@ -101,11 +151,11 @@ class AgenticPreGenerationAgent:
         
         if is_peak_hour:
             # During peak hours, prioritize all difficulty levels
-            predictions.extend(self.priority_configs)
+            predictions.extend(self.PRIORITY_CONFIGS)
         else:
             # Off-peak: focus on medium difficulty
             predictions.extend([
-                config for config in self.priority_configs 
+                config for config in self.PRIORITY_CONFIGS 
                 if config[1] == "Medium"
             ])
         
@@ -117,7 +167,9 @@ class AgenticPreGenerationAgent:
                 ("Chemistry", "Easy", 10, "IIT_JEE"),
             ])
         
-        return predictions
+        # Drop duplicates (e.g. Easy practice sets on weekend peak hours)
+        # while preserving priority order
+        return list(dict.fromkeys(predictions))
     
     async def schedule_pregeneration(
         self, 
@@ -129,143 +181,234 @@ class AgenticPreGenerationAgent:
         
         Args:
             configs: List of (subject, difficulty, count, exam_type) tuples
-            batch_size: Number of configs to process in parallel
+            batch_size: Maximum number of configs generated concurrently
         """
-        print(f"\n🤖 AGENTIC PRE-GENERATION STARTED")
-        print(f"   Configurations to generate: {len(configs)}")
-        print(f"   Batch size: {batch_size}")
-        
-        # Process in batches to avoid overloading
-        for i in range(0, len(configs), batch_size):
-            batch = configs[i:i+batch_size]
-            tasks = [self._generate_and_cache(*config) for config in batch]
-            
-            try:
-                await asyncio.gather(*tasks)
-                print(f"   ✅ Batch {i//batch_size + 1} completed")
-            except Exception as e:
-                print(f"   ⚠️  Batch {i//batch_size + 1} error: {e}")
-            
-            # Small delay between batches
-            await asyncio.sleep(2)
-        
-        print(f"🤖 AGENTIC PRE-GENERATION COMPLETED\n")
+        logger.info(
+            "Agentic pre-generation started: %d configurations, concurrency %d",
+            len(configs), batch_size
+        )
+
+        # Resolve cache hits for all configs in one MGET round trip and only
+        # dispatch generation for the misses
+        keys = [self._cache_key_for(*config) for config in configs]
+        hits = self.cache_service.mget_cached(keys)
+        configs = [config for config, hit in zip(configs, hits) if not hit]
+        logger.info("Already cached: %d, to generate: %d", sum(hits), len(configs))
+
+        # Keep at most batch_size generations in flight; a slow config no
+        # longer holds back the rest of its batch
+        sem = asyncio.Semaphore(batch_size)
+
+        async def _run(config):
+            async with sem:
+                return await self._generate_and_cache(*config, check_cache=False)
+
+        results = await asyncio.gather(
+            *[_run(config) for config in configs],
+            return_exceptions=True
+        )
+
+        # One failing or cancelled config must not discard the others' results
+        failed = 0
+        for config, result in zip(configs, results):
+            if isinstance(result, BaseException):
+                failed += 1
+                logger.warning("Pre-generation error for %s: %r", config, result)
+        if failed:
+            logger.warning("%d of %d pre-generation tasks failed", failed, len(configs))
+
+        logger.info("Agentic pre-generation completed")
+    
+    def _cache_key_for(self, subject: str, difficulty: str, count: int, exam_type: str) -> str:
+        """Cache key for a config, using the precomputed key when available"""
+        return (
+            self._key_by_config.get((subject, difficulty, count, exam_type))
+            or self.cache_service.generate_cache_key(subject, difficulty, count, exam_type)
+        )
     
     async def _generate_and_cache(
         self, 
         subject: str, 
         difficulty: str, 
         count: int, 
-        exam_type: str
+        exam_type: str,
+        check_cache: bool = True
     ):
         """
         Generate questions and store in cache
+        
+        Args:
+            check_cache: Look the key up before generating; callers that
+                already filtered out cached configs pass False
         """
+        cache_key = None
         try:
             # Check if already cached
-            cache_key = self.cache_service.generate_cache_key(
-                subject, difficulty, count, exam_type
-            )
+            cache_key = self._cache_key_for(subject, difficulty, count, exam_type)
             
-            if self.cache_service.get_cached_questions(cache_key):
-                print(f"   ⏭️  Skipping {subject}/{difficulty}/{count} - already cached")
+            if self._recently_failed(cache_key):
+                logger.debug("Skipping %s/%s/%d - failed recently", subject, difficulty, count)
                 return
             
-            # Generate questions
-            print(f"   🔄 Generating {subject}/{difficulty}/{count}...")
-            questions = await self.rag_agent.generate_questions(
-                subject=subject,
-                difficulty=difficulty,
-                count=count,
-                exam_type=exam_type
-            )
+            if cache_key in self._inflight:
+                logger.debug("Skipping %s/%s/%d - already generating", subject, difficulty, count)
+                return
+            
+            if check_cache and self.cache_service.get_cached_questions(cache_key):
+                logger.debug("Skipping %s/%s/%d - already cached", subject, difficulty, count)
+                return
+            
+            # No await between the membership check and this add, so the
+            # check-and-claim is atomic on the event loop
+            self._inflight.add(cache_key)
+            try:
+                # Generate questions
+                logger.info("Generating %s/%s/%d", subject, difficulty, count)
+                rag = await get_rag()
+                async with self._generation_slots, self._limiter:
+                    questions = await rag.generate_questions(
+                        subject=subject,
+                        difficulty=difficulty,
+                        count=count,
+                        exam_type=exam_type
+                    )
+            finally:
+                self._inflight.discard(cache_key)
+            
+            # RAGAgent reports failures as a placeholder "error" question
+            # rather than raising; don't cache those
+            if not questions or questions[0].get("id") == "error":
+                logger.warning("No usable questions for %s/%s/%d", subject, difficulty, count)
+                self._record_failure(cache_key)
+                return
             
             # Cache the results
             success = self.cache_service.set_cached_questions(cache_key, questions)
             
             if success:
-                print(f"   ✅ Cached {subject}/{difficulty}/{count}")
+                logger.info("Cached %s/%s/%d", subject, difficulty, count)
             else:
-                print(f"   ⚠️  Failed to cache {subject}/{difficulty}/{count}")
+                logger.warning("Failed to cache %s/%s/%d", subject, difficulty, count)
                 
         except Exception as e:
-            print(f"   ❌ Error generating {subject}/{difficulty}/{count}: {e}")
+            logger.error("Error generating %s/%s/%d: %s", subject, difficulty, count, e)
+            if cache_key:
+                self._record_failure(cache_key)
+    
+    def _recently_failed(self, cache_key: str) -> bool:
+        """Check the negative cache for a failure within FAILURE_TTL_SECONDS"""
+        failed_at = self._recent_failures.get(cache_key)
+        if failed_at is None:
+            return False
+        if time.time() - failed_at < self.FAILURE_TTL_SECONDS:
+            return True
+        del self._recent_failures[cache_key]
+        return False
     
-    async def monitor_and_adapt(self, db: Session):
+    def _record_failure(self, cache_key: str):
+        """Remember a failed generation, evicting the oldest entry when full"""
+        self._recent_failures[cache_key] = time.time()
+        self._recent_failures.move_to_end(cache_key)
+        while len(self._recent_failures) > self.MAX_RECENT_FAILURES:
+            self._recent_failures.popitem(last=False)
+    
+    async def monitor_and_adapt(self) -> Optional[Dict]:
         """
         Monitor cache performance and adapt strategy
+        Returns the cache stats used, or None if the cache is unavailable
         """
         try:
             stats = self.cache_service.get_cache_stats()
             
             if not stats.get("enabled"):
-                return
+                return None
             
             hit_rate = stats.get("hit_rate_percentage", 0)
             
-            print(f"\n📈 CACHE PERFORMANCE MONITORING")
-            print(f"   Hit Rate: {hit_rate}%")
-            print(f"   Total Hits: {stats.get('total_hits', 0)}")
-            print(f"   Total Misses: {stats.get('total_misses', 0)}")
-            print(f"   Cached Sets: {stats.get('total_cached_sets', 0)}")
+            logger.info(
+                "Cache performance: hit rate %s%%, hits %s, misses %s, cached sets %s",
+                hit_rate,
+                stats.get('total_hits', 0),
+                stats.get('total_misses', 0),
+                stats.get('total_cached_sets', 0)
+            )
             
             # Adapt strategy based on hit rate
             if hit_rate < 70:
-                print(f"   ⚠️  Hit rate below 70% - increasing pre-generation")
+                logger.info("Hit rate below 70%% - increasing pre-generation")
                 # Analyze patterns and pre-generate more
-                patterns = await self.analyze_user_patterns(db, days=3)
+                patterns = await self.analyze_user_patterns(days=3)
                 await self.schedule_pregeneration(patterns, batch_size=5)
             elif hit_rate > 90:
-                print(f"   ✅ Hit rate excellent - maintaining current strategy")
+                logger.info("Hit rate excellent - maintaining current strategy")
             
-            print()
+            return stats
             
         except Exception as e:
-            print(f"⚠️  Monitoring error: {e}")
+            logger.warning("Monitoring error: %s", e)
+            return None
     
     async def warm_cache_on_startup(self):
         """
         Warm cache with priority configurations on application startup
         """
-        print(f"\n🔥 WARMING CACHE ON STARTUP...")
-        await self.schedule_pregeneration(self.priority_configs[:5], batch_size=2)
-        print(f"🔥 CACHE WARMING COMPLETED\n")
+        logger.info("Warming cache on startup")
+        await self.schedule_pregeneration(self.PRIORITY_CONFIGS[:5], batch_size=2)
+        logger.info("Cache warming completed")
     
     async def run_periodic_pregeneration(self, interval_minutes: int = 30):
         """
         Run periodic pre-generation in background
         
+        The wait between runs scales with the smoothed cache hit rate:
+        ~1.3x the base interval at 90%, ~0.4x at 30%, never below 5 minutes.
+        Prediction is skipped entirely while the hit rate stays above 95%.
+        
         Args:
-            interval_minutes: How often to run (default: 30 minutes)
+            interval_minutes: Base interval between runs (default: 30 minutes)
         """
+        base_sleep = interval_minutes * 60
+        
         while True:
+            sleep_seconds = base_sleep
             try:
-                # Get current time context
-                now = datetime.now()
-                current_hour = now.hour
-                current_day = now.weekday()
-                
-                # Predict and pre-generate
-                predictions = await self.predict_next_requests(current_hour, current_day)
-                await self.schedule_pregeneration(predictions, batch_size=3)
+                if self._hit_ema is not None and self._hit_ema > self.SKIP_PREDICTION_HIT_RATE:
+                    logger.info("Hit rate %.1f%% - skipping predictive pre-generation", self._hit_ema)
+                else:
+                    # Get current time context
+                    local_time = time.localtime()
+                    current_hour = local_time.tm_hour
+                    current_day = local_time.tm_wday
+                    
+                    # Predict and pre-generate
+                    predictions = await self.predict_next_requests(current_hour, current_day)
+                    await self.schedule_pregeneration(predictions, batch_size=3)
                 
                 # Monitor performance
-                db = next(get_db())
-                await self.monitor_and_adapt(db)
+                stats = await self.monitor_and_adapt()
+                
+                if stats and "hit_rate_percentage" in stats:
+                    hit_rate = stats["hit_rate_percentage"]
+                    if self._hit_ema is None:
+                        self._hit_ema = hit_rate
+                    else:
+                        self._hit_ema = (
+                            self.HIT_RATE_EMA_ALPHA * hit_rate
+                            + (1 - self.HIT_RATE_EMA_ALPHA) * self._hit_ema
+                        )
+                    sleep_seconds = max(
+                        self.MIN_PREGENERATION_INTERVAL_SECONDS,
+                        base_sleep * (self._hit_ema / self.TARGET_HIT_RATE)
+                    )
                 
             except Exception as e:
-                print(f"⚠️  Periodic pre-generation error: {e}")
+                logger.warning("Periodic pre-generation error: %s", e)
             
             # Wait for next interval
-            await asyncio.sleep(interval_minutes * 60)
-
+            await asyncio.sleep(sleep_seconds)
 
-# Global instance
-_pregeneration_agent = None
 
+@functools.lru_cache(maxsize=1)
 def get_pregeneration_agent() -> AgenticPreGenerationAgent:
     """Get or create pre-generation agent singleton"""
-    global _pregeneration_agent
-    if _pregeneration_agent is None:
-        _pregeneration_agent = AgenticPreGenerationAgent()
-    return _pregeneration_agent
+    return AgenticPreGenerationAgent()
@@ -0,0 +1,95 @@
+"""
+Password hashing, API model config and prebuilt statements for the HTTP apps
+Shared by main.py and main_postgres.py
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from pydantic import ConfigDict
+from sqlalchemy import bindparam, exists, func, insert, literal, select
+from database import ExamAttempt, User, utc_now
+
+# ============================================================================
+# Password hashing
+# ============================================================================
+
+# bcrypt cost for new hashes; existing hashes carry their own cost
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# bcrypt releases the GIL, so threads already hash in parallel. A dedicated
+# pool sized to the cores keeps a login burst from oversubscribing the CPU
+# and from queueing behind file/ingest work on the default executor.
+_BCRYPT_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="bcrypt")
+
+async def run_bcrypt(fn, *args):
+    """Run a bcrypt call on the dedicated bcrypt pool"""
+    return await asyncio.get_running_loop().run_in_executor(_BCRYPT_EXECUTOR, fn, *args)
+
+def get_password_hash(password: str) -> str:
+    """Hash password using bcrypt"""
+    pwd_bytes = password.encode('utf-8')
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    hashed_password = bcrypt.hashpw(pwd_bytes, salt)
+    return hashed_password.decode('utf-8')
+
+# ============================================================================
+# Pydantic Models
+# ============================================================================
+
+# Shared config for the API models: drop unknown fields and make instances
+# immutable (nothing mutates them after validation)
+API_MODEL_CONFIG = ConfigDict(extra="ignore", frozen=True)
+
+# ============================================================================
+# Statements
+# ============================================================================
+
+# Built once so every lookup reuses SQLAlchemy's cached compiled statement
+USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+EMAIL_TAKEN = select(exists().where(User.email == bindparam("email")))
+USER_ID_BY_EMAIL = select(User.user_id).where(User.email == bindparam("email"))
+
+# Core INSERT ... SELECT: the user's id is resolved inside the insert, so a
+# submission is one round trip and no ORM unit-of-work flush. RETURNING
+# yields no row when the email is unknown. Built on the Table so the session
+# runs it as plain Core instead of an ORM bulk insert. exam_id stays NULL
+# until exam management is implemented.
+INSERT_ATTEMPT_FOR_EMAIL = insert(ExamAttempt.__table__).from_select(
+    [
+        "user_id", "start_time", "end_time", "score", "total_questions",
+        "correct_answers", "incorrect_answers", "unanswered", "status",
+        "subject", "difficulty"
+    ],
+    select(
+        User.user_id,
+        utc_now(),
+        utc_now(),
+        bindparam("score", type_=ExamAttempt.score.type),
+        bindparam("total_questions", type_=ExamAttempt.total_questions.type),
+        bindparam("score", type_=ExamAttempt.correct_answers.type),
+        bindparam("incorrect_answers", type_=ExamAttempt.incorrect_answers.type),
+        literal(0),
+        literal("completed"),
+        bindparam("subject", type_=ExamAttempt.subject.type),
+        bindparam("difficulty", type_=ExamAttempt.difficulty.type)
+    ).where(User.email == bindparam("email"))
+).returning(ExamAttempt.attempt_id)
+
+# One aggregated query instead of two extra queries per student; the
+# (user_id, end_time) index serves both the join and MAX(end_time)
+# Labels match the response keys, so rows stream out as-is
+STUDENT_STATS = (
+    select(
+        User.email.label("username"),
+        User.full_name,
+        func.count(ExamAttempt.attempt_id).label("exams_taken"),
+        func.max(ExamAttempt.end_time).label("last_active")
+    )
+    .outerjoin(ExamAttempt, ExamAttempt.user_id == User.user_id)
+    .where(User.role == "student")
+    # email/full_name depend on the primary key, so grouping by it alone is
+    # valid SQL and keeps the aggregate's hash key to a single integer
+    .group_by(User.user_id)
+)
@@ -1,54 +1,81 @@
 """
 Debug script to check exam attempts in database
 """
-from database import get_db, ExamAttempt, User
+import sys
+from database import SessionLocal, ExamAttempt, User
 from sqlalchemy import func
+from sqlalchemy.orm import load_only, selectinload
 
-def check_exam_attempts():
-    db = next(get_db())
-    
-    print("\n" + "="*60)
-    print("CHECKING EXAM ATTEMPTS IN DATABASE")
-    print("="*60)
-    
-    # Get all users
-    users = db.query(User).all()
-    print(f"\nTotal Users: {len(users)}")
-    
-    for user in users:
-        print(f"\n--- User: {user.email} (ID: {user.user_id}) ---")
-        
-        # Get exam attempts for this user
-        attempts = db.query(ExamAttempt).filter(
-            ExamAttempt.user_id == user.user_id
-        ).all()
-        
-        print(f"  Exam Attempts: {len(attempts)}")
-        
-        if attempts:
-            for attempt in attempts:
+def check_exam_attempts(verbose: bool = True):
+    """Print attempt counts per user; attempt rows are only loaded when verbose"""
+    with SessionLocal() as db:
+        print("\n" + "="*60)
+        print("CHECKING EXAM ATTEMPTS IN DATABASE")
+        print("="*60)
+
+        # Get all users; their attempts are loaded in one batched SELECT ... IN
+        users_query = db.query(User)
+        if verbose:
+            users_query = users_query.options(selectinload(User.exam_attempts))
+        users = users_query.all()
+        print(f"\nTotal Users: {len(users)}")
+
+        # Attempt counts for every user in a single GROUP BY query
+        counts = dict(
+            db.query(ExamAttempt.user_id, func.count(ExamAttempt.attempt_id))
+            .group_by(ExamAttempt.user_id)
+            .all()
+        )
+
+        for user in users:
+            count = counts.get(user.user_id, 0)
+            print(f"\n--- User: {user.email} (ID: {user.user_id}) ---")
+            print(f"  Exam Attempts: {count}")
+
+            if not (verbose and count):
+                continue
+
+            for attempt in user.exam_attempts:
                 print(f"    - Attempt ID: {attempt.attempt_id}")
                 print(f"      Score: {attempt.score}/{attempt.total_questions}")
                 print(f"      Started: {attempt.start_time}")
                 print(f"      Completed: {attempt.end_time}")
                 print(f"      Status: {attempt.status}")
-    
-    # Check all exam attempts regardless of user
-    print("\n" + "="*60)
-    print("ALL EXAM ATTEMPTS")
-    print("="*60)
-    
-    all_attempts = db.query(ExamAttempt).all()
-    print(f"\nTotal Exam Attempts: {len(all_attempts)}")
-    
-    for attempt in all_attempts:
-        print(f"\n  Attempt ID: {attempt.attempt_id}")
-        print(f"  User ID: {attempt.user_id}")
-        print(f"  Score: {attempt.score}/{attempt.total_questions}")
-        print(f"  Started: {attempt.start_time}")
-        print(f"  Status: {attempt.status}")
-    
-    db.close()
+
+        # Check all exam attempts regardless of user
+        print("\n" + "="*60)
+        print("ALL EXAM ATTEMPTS")
+        print("="*60)
+
+        print(f"\nTotal Exam Attempts: {sum(counts.values())}")
+
+        if not verbose:
+            return
+
+        # Stream in chunks of 500 and fetch only the printed columns
+        all_attempts = (
+            db.query(ExamAttempt)
+            .options(
+                load_only(
+                    ExamAttempt.attempt_id,
+                    ExamAttempt.user_id,
+                    ExamAttempt.score,
+                    ExamAttempt.total_questions,
+                    ExamAttempt.start_time,
+                    ExamAttempt.status
+                ),
+                selectinload(ExamAttempt.user)
+            )
+            .execution_options(stream_results=True)
+            .yield_per(500)
+        )
+        for attempt in all_attempts:
+            print(f"\n  Attempt ID: {attempt.attempt_id}")
+            print(f"  User ID: {attempt.user_id} ({attempt.user.email if attempt.user else 'no user'})")
+            print(f"  Score: {attempt.score}/{attempt.total_questions}")
+            print(f"  Started: {attempt.start_time}")
+            print(f"  Status: {attempt.status}")
 
 if __name__ == "__main__":
-    check_exam_attempts()
+    # Pass --summary to print counts only
+    check_exam_attempts(verbose="--summary" not in sys.argv)
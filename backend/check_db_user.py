@@ -1,12 +1,13 @@
 import sqlite3
+from contextlib import closing
 from main import verify_password
 
 def check_db():
-    conn = sqlite3.connect('exam_app.db')
-    c = conn.cursor()
-    c.execute("SELECT username, password_hash FROM users WHERE username='debugstudent'")
-    row = c.fetchone()
-    conn.close()
+    with closing(sqlite3.connect('exam_app.db')) as conn:
+        row = conn.execute(
+            "SELECT username, password_hash FROM users WHERE username=?",
+            ('debugstudent',)
+        ).fetchone()
     
     if row:
         username, password_hash = row
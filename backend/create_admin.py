@@ -5,6 +5,7 @@ Run this script to create an admin user for ExamAI
 
 import sys
 import os
+import asyncio
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import SessionLocal, User
@@ -12,12 +13,16 @@ from datetime import datetime
 import bcrypt
 
 def get_password_hash(password: str) -> str:
-    """Hash password using bcrypt"""
+    """Hash password using bcrypt (cost set by BCRYPT_ROUNDS, default 12)"""
     pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=int(os.getenv("BCRYPT_ROUNDS", "12")))
     hashed_password = bcrypt.hashpw(pwd_bytes, salt)
     return hashed_password.decode('utf-8')
 
+async def get_password_hash_async(password: str) -> str:
+    """Hash password in a worker thread so the event loop is not blocked"""
+    return await asyncio.to_thread(get_password_hash, password)
+
 def create_admin():
     """Create an admin user"""
     db = SessionLocal()
@@ -3,10 +3,14 @@ Database configuration and models for PostgreSQL
 Following PRD Section 9.1 - Database Design (ORM)
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, JSON
+from sqlalchemy import create_engine, event, text, Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, JSON, Index
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.functions import FunctionElement
+from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
 
@@ -15,16 +19,139 @@ load_dotenv()
 # Database URL from environment variable
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///exam_app.db")
 
+# Statement logging renders every SQL statement; keep it opt-in for debugging
+SQL_ECHO = os.getenv("SQL_ECHO") == "1"
+
+
+# Server pool settings shared by the sync and async engines. Connections are
+# recycled every 30 minutes instead of pinged with SELECT 1 on every checkout
+# (set DB_POOL_PRE_PING=1 if the server or a proxy drops idle connections sooner).
+# Each worker process has both engines, so its peak is
+# 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections: 20 with the defaults, or 80
+# for the default 4 workers, which fits Postgres' default max_connections=100.
+# Raise these only with a larger max_connections or behind PgBouncer.
+POOL_OPTIONS = {
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING") == "1",
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "5")),
+}
+
+# Connections warm_pool opens at startup, per worker process
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", "2"))
+
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER") == "1"
+
+# The app's queries are small OLTP lookups, for which Postgres JIT compilation
+# is pure startup cost. Turned off per connection unless DB_JIT=1; PgBouncer
+# rejects unknown startup parameters, so there it's left to the server config.
+DISABLE_JIT = os.getenv("DB_JIT") != "1" and not DB_PGBOUNCER
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Use WAL so readers don't block the writer, and relax fsyncs"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
 # Create engine
-engine = create_engine(DATABASE_URL, echo=False)
+if DATABASE_URL.startswith("sqlite"):
+    # Sessions are used from FastAPI's threadpool, so the SQLite connection
+    # must not be pinned to the thread that opened it
+    engine = create_engine(
+        DATABASE_URL,
+        echo=SQL_ECHO,
+        connect_args={"check_same_thread": False}
+    )
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        echo=SQL_ECHO,
+        poolclass=QueuePool,
+        connect_args={"options": "-c jit=off"} if DISABLE_JIT and DATABASE_URL.startswith("postgres") else {},
+        **POOL_OPTIONS
+    )
 
 # Create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _to_async_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver (asyncpg / aiosqlite)"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            # asyncpg takes ssl=... rather than libpq's sslmode=...
+            return "postgresql+asyncpg://" + url[len(prefix):].replace("sslmode=", "ssl=")
+    return url
+
+
+# Async engine for the FastAPI handlers in main.py; scripts, routers and
+# background services keep using the sync engine above
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _to_async_url(DATABASE_URL)
+
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=SQL_ECHO)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+else:
+    # asyncpg prepares each statement once per connection and reuses the
+    # server-side plan; size the cache to hold every hot statement. Behind
+    # PgBouncer in transaction mode the caches must be off, since consecutive
+    # statements may hit different backends.
+    if DB_PGBOUNCER:
+        asyncpg_args = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    else:
+        asyncpg_args = {
+            "prepared_statement_cache_size": int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "500"))
+        }
+    if DISABLE_JIT:
+        asyncpg_args["server_settings"] = {"jit": "off"}
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=SQL_ECHO,
+        connect_args=asyncpg_args if ASYNC_DATABASE_URL.startswith("postgresql+asyncpg") else {},
+        **POOL_OPTIONS
+    )
+
+# expire_on_commit=False: attributes can't lazy-load after commit in async code
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # Base class for models
 Base = declarative_base()
 
 
+def utcnow() -> datetime:
+    """Naive UTC timestamp for column defaults (datetime.utcnow is deprecated in 3.12)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class utc_now(FunctionElement):
+    """
+    Database-side counterpart of utcnow(): the server's clock as a naive UTC
+    timestamp, so hot-path writes don't compute or bind one in Python
+    """
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(utc_now)
+def _utc_now_default(element, compiler, **kw):
+    # SQLite's 'now' is UTC; CURRENT_TIMESTAMP would drop the fractional seconds
+    return "STRFTIME('%Y-%m-%d %H:%M:%f', 'now')"
+
+@compiles(utc_now, "postgresql")
+def _utc_now_postgresql(element, compiler, **kw):
+    # Columns are timestamp without time zone, so convert rather than let
+    # the session TimeZone apply
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
 # ============================================================================
 # PRD Section 9.1 - Core Entities
 # ============================================================================
@@ -35,13 +162,13 @@ class User(Base):
     
     user_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     email = Column(String(255), unique=True, nullable=False, index=True)
-    password_hash = Column(String(255), nullable=False)
+    password_hash = Column(String(255), nullable=True)  # NULL for Google OAuth users
     full_name = Column(String(255))
     role = Column(String(50), default="student")  # student/admin
     phone_number = Column(String(20))
     google_id = Column(String(255), unique=True, nullable=True)  # For Google OAuth
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
     last_login = Column(DateTime)
     is_active = Column(Boolean, default=True)
     
@@ -63,7 +190,7 @@ class Exam(Base):
     total_marks = Column(Integer)
     passing_marks = Column(Integer)
     created_by = Column(Integer, ForeignKey("users.user_id"))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow)
     is_active = Column(Boolean, default=True)
     
     # Relationships
@@ -83,8 +210,8 @@ class Syllabus(Base):
     subject_name = Column(String(255), nullable=False)
     topics = Column(JSON)  # Store topics as JSON array
     description = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
     
     # Relationships
     exam = relationship("Exam", back_populates="syllabi")
@@ -106,7 +233,7 @@ class Question(Base):
     marks = Column(Integer)
     negative_marks = Column(Float, default=0.0)
     explanation = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow)
     
     # Relationships
     exam = relationship("Exam", back_populates="questions")
@@ -120,7 +247,7 @@ class ExamAttempt(Base):
     attempt_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.user_id"))
     exam_id = Column(Integer, ForeignKey("exams.exam_id"))
-    start_time = Column(DateTime, default=datetime.utcnow)
+    start_time = Column(DateTime, default=utcnow)
     end_time = Column(DateTime)
     score = Column(Float)
     total_questions = Column(Integer)
@@ -128,6 +255,17 @@ class ExamAttempt(Base):
     incorrect_answers = Column(Integer)
     unanswered = Column(Integer)
     status = Column(String(50), default="in_progress")  # completed/in_progress
+    subject = Column(String(255))  # Subject of the generated question set
+    difficulty = Column(String(50))  # Easy/Medium/Hard
+    
+    __table_args__ = (
+        # Pattern analysis: recent attempts grouped by configuration
+        Index("ix_attempts_time_subj_diff", "start_time", "subject", "difficulty", "total_questions"),
+        # Per-user attempt lookups
+        Index("ix_attempts_user_status", "user_id", "status"),
+        # Admin activity view: a user's attempts, newest first
+        Index("ix_attempts_user_end", user_id, end_time.desc()),
+    )
     
     # Relationships
     user = relationship("User", back_populates="exam_attempts")
@@ -166,7 +304,13 @@ class StudyMaterial(Base):
     topic = Column(String(255))
     exam_id = Column(Integer, ForeignKey("exams.exam_id"))
     uploaded_by = Column(Integer, ForeignKey("users.user_id"))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow)
+    status = Column(String(50), default="indexed")  # pending/indexed/no_text/failed
+    
+    __table_args__ = (
+        # Documents list is ordered newest first
+        Index("ix_materials_created", created_at.desc()),
+    )
     
     # Relationships
     exam = relationship("Exam", back_populates="study_materials")
@@ -179,12 +323,12 @@ class Subscription(Base):
     subscription_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.user_id"))
     plan_type = Column(String(50))  # monthly/quarterly/annual
-    start_date = Column(DateTime, default=datetime.utcnow)
+    start_date = Column(DateTime, default=utcnow)
     end_date = Column(DateTime)
     amount = Column(Float)
     payment_status = Column(String(50))  # active/expired/cancelled
     auto_renew = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow)
     # Additional fields for subscription management
     plan_details = Column(JSON)  # Store plan configuration
     discount_applied = Column(Float, default=0.0)  # Discount percentage
@@ -206,7 +350,7 @@ class Payment(Base):
     payment_method = Column(String(50))
     transaction_id = Column(String(255), unique=True)
     status = Column(String(50))  # success/failed/pending
-    payment_date = Column(DateTime, default=datetime.utcnow)
+    payment_date = Column(DateTime, default=utcnow)
     # Razorpay specific fields
     razorpay_order_id = Column(String(255))
     razorpay_payment_id = Column(String(255))
@@ -227,7 +371,7 @@ class Report(Base):
     exam_id = Column(Integer, ForeignKey("exams.exam_id"))
     attempt_id = Column(Integer, ForeignKey("exam_attempts.attempt_id"))
     report_url = Column(String(500))  # PDF URL
-    generated_at = Column(DateTime, default=datetime.utcnow)
+    generated_at = Column(DateTime, default=utcnow)
     
     # Relationships
     user = relationship("User", back_populates="reports")
@@ -248,6 +392,26 @@ def init_db():
     print("✅ Database tables created successfully!")
 
 
+async def warm_pool():
+    """
+    Open a few connections on the async engine (the one the request handlers
+    use) up front, so the first requests skip the connect cost
+    """
+    pool = async_engine.pool
+    count = min(DB_POOL_WARM, pool.size()) if hasattr(pool, "size") else 0
+    conns = []
+    try:
+        for _ in range(count):
+            conn = await async_engine.connect()
+            conns.append(conn)
+            await conn.execute(text("SELECT 1"))
+    finally:
+        # Closing returns each connection to the pool
+        for conn in conns:
+            await conn.close()
+    print(f"✅ Connection pool warmed ({len(conns)} connections)")
+
+
 def get_db():
     """Dependency to get database session"""
     db = SessionLocal()
@@ -257,6 +421,12 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency to get an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 if __name__ == "__main__":
     print("Creating database tables...")
     init_db()
@@ -3,10 +3,11 @@ Exam Type Management Service
 Handles IIT/JEE, NEET, EAMCET exam configurations
 """
 
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+import orjson
 from sqlalchemy.orm import Session
-from database import Exam, Syllabus
-from datetime import datetime
+from database import Exam, Syllabus, utcnow
 
 # Exam Type Configurations
 EXAM_TYPES = {
@@ -162,76 +163,162 @@ SYLLABUS_TOPICS = {
 }
 
 
+def _freeze(value: Any) -> Any:
+    """Read-only copy of a config value: dicts become MappingProxyType, lists tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+# Response payloads built once at import; EXAM_TYPES never changes at runtime.
+# They are shared between requests, so they're frozen (see _freeze) once the
+# JSON bodies below have been serialized from the plain versions.
+_ALL_EXAM_TYPES: List[Dict] = [
+    {
+        "id": exam_id,
+        "name": config["name"],
+        "full_name": config["full_name"],
+        "subjects": config["subjects"],
+        "description": config["description"],
+        "duration": config["duration"],
+        "total_marks": config["total_marks"],
+        "pattern": config["pattern"]
+    }
+    for exam_id, config in EXAM_TYPES.items()
+]
+
+_EXAM_TYPE_DETAILS: Dict[str, Dict] = {
+    exam_id: {
+        "id": exam_id,
+        "name": config["name"],
+        "full_name": config["full_name"],
+        "subjects": config["subjects"],
+        "description": config["description"],
+        "duration": config["duration"],
+        "total_marks": config["total_marks"],
+        "passing_marks": config["passing_marks"],
+        "pattern": config["pattern"]
+    }
+    for exam_id, config in EXAM_TYPES.items()
+}
+
+# Lookups are case-insensitive ("IIT_JEE", "iit_jee", "Iit_Jee"): every
+# public method resolves its argument to the canonical id first
+_EXAM_TYPE_IDS: Dict[str, str] = {exam_id.upper(): exam_id for exam_id in EXAM_TYPES}
+
+def _resolve(exam_type_id: str) -> Optional[str]:
+    """Canonical EXAM_TYPES key for exam_type_id, or None if unknown"""
+    return _EXAM_TYPE_IDS.get(exam_type_id.upper())
+
+# Frozen all the way down, so the shared objects can be handed out as-is
+_PATTERNS: Dict[str, Mapping] = {
+    exam_id: _freeze(config["pattern"]) for exam_id, config in EXAM_TYPES.items()
+}
+_MARKING_SCHEMES: Dict[str, Mapping] = {
+    exam_id: pattern["marking_scheme"] for exam_id, pattern in _PATTERNS.items()
+}
+
+
+def _build_syllabus_json() -> Dict[Tuple[str, Optional[str]], bytes]:
+    """Serialize every /exam-types/{id}/syllabus body, keyed by (id, subject)"""
+    bodies = {}
+    for exam_id, syllabus in SYLLABUS_TOPICS.items():
+        # subject None is the full syllabus
+        bodies[(exam_id, None)] = orjson.dumps({"exam_type": exam_id, "syllabus": syllabus})
+        for subject, topics in syllabus.items():
+            bodies[(exam_id, subject)] = orjson.dumps(
+                {"exam_type": exam_id, "syllabus": {subject: topics}}
+            )
+    return bodies
+
+_SYLLABUS_JSON = _build_syllabus_json()
+
+_ALL_EXAM_TYPES_JSON = orjson.dumps({"exam_types": _ALL_EXAM_TYPES})
+
+_ALL_EXAM_TYPES: Tuple[Mapping, ...] = _freeze(_ALL_EXAM_TYPES)
+_EXAM_TYPE_DETAILS: Dict[str, Mapping] = {
+    exam_id: _freeze(details) for exam_id, details in _EXAM_TYPE_DETAILS.items()
+}
+
+_SUBJECTS_JSON: Dict[str, bytes] = {
+    exam_id: orjson.dumps({"exam_type": exam_id, "subjects": config["subjects"]})
+    for exam_id, config in EXAM_TYPES.items()
+}
+
 class ExamTypeService:
     """Service for managing exam types and their configurations"""
     
     @staticmethod
-    def get_all_exam_types() -> List[Dict]:
-        """Get all available exam types"""
-        return [
-            {
-                "id": exam_id,
-                "name": config["name"],
-                "full_name": config["full_name"],
-                "subjects": config["subjects"],
-                "description": config["description"],
-                "duration": config["duration"],
-                "total_marks": config["total_marks"],
-                "pattern": config["pattern"]
-            }
-            for exam_id, config in EXAM_TYPES.items()
-        ]
+    def get_all_exam_types() -> Tuple[Mapping, ...]:
+        """Get all available exam types (shared, read-only)"""
+        return _ALL_EXAM_TYPES
     
     @staticmethod
-    def get_exam_type(exam_type_id: str) -> Optional[Dict]:
-        """Get specific exam type configuration"""
-        if exam_type_id not in EXAM_TYPES:
-            return None
-        
-        config = EXAM_TYPES[exam_type_id]
-        return {
-            "id": exam_type_id,
-            "name": config["name"],
-            "full_name": config["full_name"],
-            "subjects": config["subjects"],
-            "description": config["description"],
-            "duration": config["duration"],
-            "total_marks": config["total_marks"],
-            "passing_marks": config["passing_marks"],
-            "pattern": config["pattern"]
-        }
+    def get_all_exam_types_json() -> bytes:
+        """Get the pre-serialized /exam-types response body"""
+        return _ALL_EXAM_TYPES_JSON
     
     @staticmethod
-    def get_subjects_for_exam_type(exam_type_id: str) -> List[str]:
+    def resolve_exam_type_id(exam_type_id: str) -> Optional[str]:
+        """Get the canonical id ("IIT_JEE") for any casing of an exam type id"""
+        return _resolve(exam_type_id)
+    
+    @staticmethod
+    def get_exam_type(exam_type_id: str) -> Optional[Mapping]:
+        """Get specific exam type configuration (shared, read-only)"""
+        return _EXAM_TYPE_DETAILS.get(_resolve(exam_type_id))
+    
+    @staticmethod
+    def get_subjects_for_exam_type(exam_type_id: str) -> Tuple[str, ...]:
         """Get subjects for a specific exam type"""
-        if exam_type_id not in EXAM_TYPES:
-            return []
-        return EXAM_TYPES[exam_type_id]["subjects"]
+        details = _EXAM_TYPE_DETAILS.get(_resolve(exam_type_id))
+        if details is None:
+            return ()
+        return details["subjects"]
+    
+    @staticmethod
+    def get_subjects_json(exam_type_id: str) -> Optional[bytes]:
+        """Get the pre-serialized /exam-types/{id}/subjects response body"""
+        return _SUBJECTS_JSON.get(_resolve(exam_type_id))
     
     @staticmethod
     def get_syllabus_for_exam_type(exam_type_id: str, subject: Optional[str] = None) -> Dict:
         """Get syllabus topics for exam type and subject"""
-        if exam_type_id not in SYLLABUS_TOPICS:
+        syllabus = SYLLABUS_TOPICS.get(_resolve(exam_type_id))
+        if syllabus is None:
             return {}
         
-        syllabus = SYLLABUS_TOPICS[exam_type_id]
-        
         if subject:
             return {subject: syllabus.get(subject, [])}
         
         return syllabus
     
+    @staticmethod
+    def get_syllabus_json(exam_type_id: str, subject: Optional[str] = None) -> Optional[bytes]:
+        """
+        Get the pre-serialized syllabus response body
+        Returns None for combinations that aren't precomputed
+        """
+        return _SYLLABUS_JSON.get((_resolve(exam_type_id), subject or None))
+    
     @staticmethod
     def create_exam_in_db(
         db: Session,
         exam_type_id: str,
         created_by: int
     ) -> Optional[Exam]:
-        """Create exam record in database"""
-        if exam_type_id not in EXAM_TYPES:
+        """
+        Create exam record in database
+        Returns the exam detached from the session with its columns loaded
+        """
+        exam_type_id = _resolve(exam_type_id)
+        if exam_type_id is None:
             return None
         
         config = EXAM_TYPES[exam_type_id]
+        now = utcnow()
         
         exam = Exam(
             exam_name=config["full_name"],
@@ -240,47 +327,61 @@ class ExamTypeService:
             total_marks=config["total_marks"],
             passing_marks=config["passing_marks"],
             created_by=created_by,
-            created_at=datetime.utcnow(),
+            created_at=now,
             is_active=True
         )
         
-        db.add(exam)
-        db.commit()
-        db.refresh(exam)
-        
-        # Create syllabus entries
-        syllabus_data = SYLLABUS_TOPICS.get(exam_type_id, {})
-        for subject, topics in syllabus_data.items():
-            syllabus = Syllabus(
-                exam_id=exam.exam_id,
-                subject_name=subject,
-                topics=topics,
-                description=f"{subject} syllabus for {config['name']}",
-                created_at=datetime.utcnow()
-            )
-            db.add(syllabus)
-        
-        db.commit()
+        try:
+            db.add(exam)
+            db.flush()  # Assigns exam.exam_id without committing
+            
+            # Create syllabus entries in a single executemany INSERT
+            syllabus_data = SYLLABUS_TOPICS.get(exam_type_id, {})
+            rows = [
+                {
+                    "exam_id": exam.exam_id,
+                    "subject_name": subject,
+                    "topics": topics,
+                    "description": f"{subject} syllabus for {config['name']}",
+                    "created_at": now,
+                    "updated_at": now
+                }
+                for subject, topics in syllabus_data.items()
+            ]
+            if rows:
+                db.bulk_insert_mappings(Syllabus, rows)
+            
+            # The flush already populated every column (exam_id via RETURNING
+            # where supported); detach so commit doesn't expire the object and
+            # force a reload SELECT when the caller reads it
+            db.expunge(exam)
+            db.commit()
+        except Exception:
+            # Exam and syllabi are one unit of work; don't leave a half-created exam
+            db.rollback()
+            raise
         
         return exam
     
     @staticmethod
-    def get_exam_pattern(exam_type_id: str) -> Optional[Dict]:
-        """Get exam pattern details"""
-        if exam_type_id not in EXAM_TYPES:
-            return None
-        
-        return EXAM_TYPES[exam_type_id]["pattern"]
+    def get_exam_pattern(exam_type_id: str) -> Optional[Mapping]:
+        """
+        Get exam pattern details
+        Returns a shared read-only mapping; copy it (e.g. dict(...)) before
+        modifying or passing it to json/orjson
+        """
+        return _PATTERNS.get(_resolve(exam_type_id))
     
     @staticmethod
     def validate_exam_type(exam_type_id: str) -> bool:
         """Validate if exam type exists"""
-        return exam_type_id in EXAM_TYPES
+        return _resolve(exam_type_id) is not None
     
     @staticmethod
-    def get_marking_scheme(exam_type_id: str) -> Optional[Dict]:
-        """Get marking scheme for exam type"""
-        if exam_type_id not in EXAM_TYPES:
-            return None
-        
-        return EXAM_TYPES[exam_type_id]["pattern"]["marking_scheme"]
+    def get_marking_scheme(exam_type_id: str) -> Optional[Mapping]:
+        """
+        Get marking scheme for exam type
+        Returns a shared read-only mapping; copy it (e.g. dict(...)) before
+        modifying or passing it to json/orjson
+        """
+        return _MARKING_SCHEMES.get(_resolve(exam_type_id))
@@ -10,6 +10,8 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 from datetime import datetime
+import glob
+import io
 import os
 from typing import Dict
 
@@ -17,12 +19,84 @@ from typing import Dict
 class InvoiceService:
     """Service class for generating PDF invoices"""
     
+    # Styles are stateless descriptors, so build them once rather than per invoice
+    STYLES = getSampleStyleSheet()
+    
+    TITLE_STYLE = ParagraphStyle(
+        'CustomTitle',
+        parent=STYLES['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1a73e8'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    
+    HEADING_STYLE = ParagraphStyle(
+        'CustomHeading',
+        parent=STYLES['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#333333'),
+        spaceAfter=12
+    )
+    
+    FOOTER_STYLE = ParagraphStyle(
+        'Footer',
+        parent=STYLES['Normal'],
+        fontSize=9,
+        textColor=colors.HexColor('#666666'),
+        alignment=TA_CENTER
+    )
+    
+    INVOICE_TABLE_STYLE = TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#333333')),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ])
+    
+    BILL_TO_TABLE_STYLE = TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#666666')),
+    ])
+    
+    SUBSCRIPTION_TABLE_STYLE = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a73e8')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cccccc')),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('TOPPADDING', (0, 1), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+    ])
+    
+    SUMMARY_TABLE_STYLE = TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (0, -2), 'Helvetica'),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 11),
+        ('TEXTCOLOR', (0, 0), (-1, -2), colors.HexColor('#333333')),
+        ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#1a73e8')),
+        ('LINEABOVE', (0, -1), (-1, -1), 2, colors.HexColor('#1a73e8')),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ])
+    
     def __init__(self):
         """Initialize invoice service"""
         self.invoice_dir = "invoices"
         # Create invoices directory if it doesn't exist
         if not os.path.exists(self.invoice_dir):
             os.makedirs(self.invoice_dir)
+        # payment_id -> invoice path, filled as invoices are generated/found
+        self._index: Dict[int, str] = {}
+        self._index_loaded = False
     
     def generate_invoice(self, payment_data: Dict, user_data: Dict, 
                         subscription_data: Dict) -> Dict:
@@ -35,158 +109,109 @@ class InvoiceService:
             subscription_data: Dictionary containing subscription details
             
         Returns:
-            Dictionary with invoice file path and status
+            Dictionary with invoice file path, status and the PDF bytes
         """
         try:
+            # Pull every field used in the tables once
+            now = datetime.now()
+            amount = payment_data.get('amount', 0)
+            transaction_id = payment_data.get('transaction_id', 'N/A')
+            payment_status = payment_data.get('status', 'N/A').upper()
+            plan_name = f"{subscription_data.get('plan_type', 'N/A').title()} Plan"
+            duration = subscription_data.get('duration', 'N/A')
+            discount = subscription_data.get('discount_applied', 0)
+            original_amount = subscription_data.get('original_amount', amount)
+            phone_number = user_data.get('phone_number') or ''
+            
             # Generate unique invoice filename
-            invoice_number = f"INV-{payment_data['payment_id']}-{datetime.now().strftime('%Y%m%d')}"
+            invoice_number = f"INV-{payment_data['payment_id']}-{now.strftime('%Y%m%d')}"
             filename = f"{invoice_number}.pdf"
             filepath = os.path.join(self.invoice_dir, filename)
             
-            # Create PDF document
-            doc = SimpleDocTemplate(filepath, pagesize=A4)
+            # Render into memory; the file is written in one go after build
+            buffer = io.BytesIO()
+            doc = SimpleDocTemplate(buffer, pagesize=A4)
             elements = []
-            styles = getSampleStyleSheet()
-            
-            # Custom styles
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=24,
-                textColor=colors.HexColor('#1a73e8'),
-                spaceAfter=30,
-                alignment=TA_CENTER
-            )
-            
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=14,
-                textColor=colors.HexColor('#333333'),
-                spaceAfter=12
-            )
             
             # Company Header
-            elements.append(Paragraph("Exam Preparation Platform", title_style))
-            elements.append(Paragraph("INVOICE", styles['Heading2']))
+            elements.append(Paragraph("Exam Preparation Platform", self.TITLE_STYLE))
+            elements.append(Paragraph("INVOICE", self.STYLES['Heading2']))
             elements.append(Spacer(1, 0.3*inch))
             
             # Invoice Details
             invoice_info = [
                 ["Invoice Number:", invoice_number],
-                ["Invoice Date:", datetime.now().strftime("%B %d, %Y")],
-                ["Payment ID:", payment_data.get('transaction_id', 'N/A')]
+                ["Invoice Date:", now.strftime("%B %d, %Y")],
+                ["Payment ID:", transaction_id]
             ]
             
             invoice_table = Table(invoice_info, colWidths=[2*inch, 3*inch])
-            invoice_table.setStyle(TableStyle([
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#333333')),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ]))
+            invoice_table.setStyle(self.INVOICE_TABLE_STYLE)
             elements.append(invoice_table)
             elements.append(Spacer(1, 0.3*inch))
             
             # Bill To Section
-            elements.append(Paragraph("Bill To:", heading_style))
+            elements.append(Paragraph("Bill To:", self.HEADING_STYLE))
             bill_to_info = [
                 [user_data.get('full_name', 'N/A')],
                 [user_data.get('email', 'N/A')],
-                [user_data.get('phone_number', 'N/A') if user_data.get('phone_number') else '']
+                [phone_number]
             ]
             
             bill_to_table = Table(bill_to_info, colWidths=[5*inch])
-            bill_to_table.setStyle(TableStyle([
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#666666')),
-            ]))
+            bill_to_table.setStyle(self.BILL_TO_TABLE_STYLE)
             elements.append(bill_to_table)
             elements.append(Spacer(1, 0.4*inch))
             
             # Subscription Details
-            elements.append(Paragraph("Subscription Details:", heading_style))
-            
-            plan_name = subscription_data.get('plan_type', 'N/A').title() + " Plan"
+            elements.append(Paragraph("Subscription Details:", self.HEADING_STYLE))
             
             subscription_details = [
                 ['Description', 'Duration', 'Amount'],
                 [
                     plan_name,
-                    subscription_data.get('duration', 'N/A'),
-                    f"₹{payment_data.get('amount', 0):.2f}"
+                    duration,
+                    f"₹{amount:.2f}"
                 ]
             ]
             
             subscription_table = Table(subscription_details, colWidths=[3*inch, 1.5*inch, 1.5*inch])
-            subscription_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a73e8')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cccccc')),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('TOPPADDING', (0, 1), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-            ]))
+            subscription_table.setStyle(self.SUBSCRIPTION_TABLE_STYLE)
             elements.append(subscription_table)
             elements.append(Spacer(1, 0.3*inch))
             
             # Payment Summary
-            discount = subscription_data.get('discount_applied', 0)
-            original_amount = subscription_data.get('original_amount', payment_data.get('amount', 0))
-            final_amount = payment_data.get('amount', 0)
-            
             summary_data = []
             if discount > 0:
                 summary_data.append(['Subtotal:', f"₹{original_amount:.2f}"])
-                summary_data.append([f'Discount ({discount}%):', f"-₹{(original_amount - final_amount):.2f}"])
+                summary_data.append([f'Discount ({discount}%):', f"-₹{(original_amount - amount):.2f}"])
             
-            summary_data.append(['Total Amount:', f"₹{final_amount:.2f}"])
-            summary_data.append(['Payment Status:', payment_data.get('status', 'N/A').upper()])
+            summary_data.append(['Total Amount:', f"₹{amount:.2f}"])
+            summary_data.append(['Payment Status:', payment_status])
             
             summary_table = Table(summary_data, colWidths=[4*inch, 2*inch])
-            summary_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-                ('FONTNAME', (0, 0), (0, -2), 'Helvetica'),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 11),
-                ('TEXTCOLOR', (0, 0), (-1, -2), colors.HexColor('#333333')),
-                ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#1a73e8')),
-                ('LINEABOVE', (0, -1), (-1, -1), 2, colors.HexColor('#1a73e8')),
-                ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ]))
+            summary_table.setStyle(self.SUMMARY_TABLE_STYLE)
             elements.append(summary_table)
             elements.append(Spacer(1, 0.5*inch))
             
             # Footer
-            footer_style = ParagraphStyle(
-                'Footer',
-                parent=styles['Normal'],
-                fontSize=9,
-                textColor=colors.HexColor('#666666'),
-                alignment=TA_CENTER
-            )
-            
             elements.append(Spacer(1, 0.5*inch))
-            elements.append(Paragraph("Thank you for your subscription!", footer_style))
-            elements.append(Paragraph("For support, contact: support@examplatform.com", footer_style))
+            elements.append(Paragraph("Thank you for your subscription!", self.FOOTER_STYLE))
+            elements.append(Paragraph("For support, contact: support@examplatform.com", self.FOOTER_STYLE))
             
             # Build PDF
             doc.build(elements)
+            pdf_bytes = buffer.getvalue()
+            with open(filepath, "wb") as f:
+                f.write(pdf_bytes)
+            self._index[payment_data['payment_id']] = filepath
             
             return {
                 "success": True,
                 "invoice_path": filepath,
                 "invoice_number": invoice_number,
-                "filename": filename
+                "filename": filename,
+                "pdf_bytes": pdf_bytes
             }
         except Exception as e:
             return {
@@ -204,11 +229,31 @@ class InvoiceService:
         Returns:
             File path to the invoice
         """
-        # Search for invoice file matching payment_id
-        for filename in os.listdir(self.invoice_dir):
-            if f"-{payment_id}-" in filename:
-                return os.path.join(self.invoice_dir, filename)
+        if payment_id in self._index:
+            return self._index[payment_id]
+        
+        # Index existing invoices once per process (e.g. after a restart)
+        if not self._index_loaded:
+            self._load_index()
+            if payment_id in self._index:
+                return self._index[payment_id]
+        
+        # Invoices written by another worker since the index was loaded
+        matches = glob.glob(os.path.join(self.invoice_dir, f"INV-{payment_id}-*.pdf"))
+        if matches:
+            self._index[payment_id] = matches[0]
+            return matches[0]
         return None
+    
+    def _load_index(self):
+        """Populate the payment_id index with one pass over the invoice directory"""
+        with os.scandir(self.invoice_dir) as entries:
+            for entry in entries:
+                # Filenames look like INV-{payment_id}-{YYYYMMDD}.pdf
+                parts = entry.name.split("-")
+                if len(parts) >= 3 and parts[0] == "INV" and parts[1].isdigit():
+                    self._index.setdefault(int(parts[1]), entry.path)
+        self._index_loaded = True
 
 
 # Create singleton instance
@@ -0,0 +1,43 @@
+"""
+Streaming JSON array responses for large query results
+Shared by main.py and main_postgres.py
+"""
+
+import orjson
+from fastapi.responses import StreamingResponse
+from database import AsyncSessionLocal
+
+STREAM_BATCH_SIZE = 500
+
+
+async def json_array_response(stmt, params=None, to_item=dict) -> StreamingResponse:
+    """
+    Run stmt on a server-side cursor and stream its rows as a JSON array,
+    STREAM_BATCH_SIZE rows per chunk.
+    The query and its first batch run before the response is returned, so
+    errors there still propagate to the caller (and become a proper 500);
+    only a failure partway through a long result can truncate the body.
+    """
+    # Own session: the body is sent after the request's dependencies are torn down
+    db = AsyncSessionLocal()
+    try:
+        result = await db.stream(stmt.execution_options(yield_per=STREAM_BATCH_SIZE), params)
+        partitions = result.mappings().partitions()
+        first = await anext(partitions, None)
+    except BaseException:
+        await db.close()
+        raise
+    
+    async def body():
+        try:
+            if first is None:
+                yield b"[]"
+                return
+            yield b"[" + b",".join(orjson.dumps(to_item(row)) for row in first)
+            async for rows in partitions:
+                yield b"," + b",".join(orjson.dumps(to_item(row)) for row in rows)
+            yield b"]"
+        finally:
+            await db.close()
+    
+    return StreamingResponse(body(), media_type="application/json")
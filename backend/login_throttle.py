@@ -0,0 +1,51 @@
+"""
+Failed-login lockout for the auth endpoints
+Shared by main.py and main_postgres.py
+"""
+
+import os
+import time
+from typing import Dict, Tuple
+from fastapi import Request
+
+# Failed password checks per (email, client IP) -> (first failure, count). Once
+# a pair reaches LOGIN_MAX_FAILURES, further attempts from that client in the
+# window are refused before any bcrypt work. Keying on the client as well means
+# a stranger's bad guesses can't lock the owner out of their account.
+# The counters live in this process: they reset on restart and aren't shared
+# between workers, so with N workers a client gets up to N * LOGIN_MAX_FAILURES
+# guesses per window.
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "10"))
+LOGIN_LOCKOUT_SECONDS = int(os.getenv("LOGIN_LOCKOUT_SECONDS", "300"))
+_LOGIN_FAILURES_MAX = 10000
+_login_failures: Dict[Tuple[str, str], Tuple[float, int]] = {}
+
+def login_key(email: str, request: Request) -> Tuple[str, str]:
+    """Lockout key for a login attempt: the email and the client's address"""
+    return (email, request.client.host if request.client else "")
+
+def login_locked(key: Tuple[str, str]) -> bool:
+    """True while key has LOGIN_MAX_FAILURES failures inside the current window"""
+    entry = _login_failures.get(key)
+    if entry is None:
+        return False
+    if time.monotonic() - entry[0] >= LOGIN_LOCKOUT_SECONDS:
+        _login_failures.pop(key, None)
+        return False
+    return entry[1] >= LOGIN_MAX_FAILURES
+
+def record_login_failure(key: Tuple[str, str]):
+    """Count a failed password check against key"""
+    now = time.monotonic()
+    first, count = _login_failures.pop(key, (now, 0))
+    if now - first >= LOGIN_LOCKOUT_SECONDS:
+        first, count = now, 0
+    # Re-inserted at the end, so the first entry is the stalest; bounded
+    # because clients from many addresses would otherwise grow it freely
+    _login_failures[key] = (first, count + 1)
+    while len(_login_failures) > _LOGIN_FAILURES_MAX:
+        del _login_failures[next(iter(_login_failures))]
+
+def clear_login_failures(key: Tuple[str, str]):
+    """Forget key's failures after a successful login"""
+    _login_failures.pop(key, None)
@@ -3,19 +3,34 @@ Updated FastAPI backend with PostgreSQL support
 Following PRD requirements for database structure
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, status, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, status, Form, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-import shutil
+import asyncio
 import os
+import hashlib
+import secrets
+import time
+from collections import OrderedDict
+import logging
+import aiofiles
 import bcrypt
-from rag_service import RAGAgent
+import orjson
+from rag_service import RAGAgent, get_rag, get_rag_agent
+from api_common import (
+    API_MODEL_CONFIG, EMAIL_TAKEN, INSERT_ATTEMPT_FOR_EMAIL, STUDENT_STATS, USER_BY_EMAIL,
+    USER_ID_BY_EMAIL, get_password_hash, run_bcrypt
+)
+from json_stream import json_array_response
+from login_throttle import LOGIN_LOCKOUT_SECONDS, clear_login_failures, login_key, login_locked, record_login_failure
 from model_service import ModelService
 from database import (
-    get_db, init_db, User, Exam, Question, ExamAttempt, 
+    get_db, get_async_db, init_db, warm_pool, utcnow, utc_now, AsyncSessionLocal, User, Exam, Question, ExamAttempt, 
     Answer, StudyMaterial, Subscription, Payment, Report
 )
 from subscription_routes import router as subscription_router
@@ -27,7 +42,14 @@ from agentic_pregeneration_service import get_pregeneration_agent
 
 from exam_type_service import ExamTypeService
 
-app = FastAPI(title="ExamAI RAG Backend - PostgreSQL")
+# Root log level for this module and the services (pre-generation agent etc.)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+logger = logging.getLogger(__name__)
+
+app = FastAPI(
+    title="ExamAI RAG Backend - PostgreSQL",
+    default_response_class=ORJSONResponse
+)
 
 # Include subscription routes
 app.include_router(subscription_router)
@@ -40,6 +62,22 @@ app.include_router(performance_router)
 # Include exam pattern management routes
 
 
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "50")) << 20
+
+# Registered before CORS so CORS stays outermost and 413s still carry its headers
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """
+    Reject oversized uploads from Content-Length before the body is read;
+    UploadFile spools the whole body before the handler runs
+    """
+    if request.url.path == "/upload-document":
+        # Content-Length covers the whole multipart body; allow for its framing
+        content_length = request.headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + (64 << 10):
+            return ORJSONResponse({"detail": "File too large"}, status_code=413)
+    return await call_next(request)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -53,48 +91,83 @@ app.add_middleware(
 cache_service = get_cache_service()
 pregeneration_agent = get_pregeneration_agent()
 
+# Uploaded documents are written here (created at startup)
+UPLOAD_DIR = "uploads"
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
     print("🚀 Starting ExamAI Backend...")
-    init_db()
+    # Schema check is blocking I/O; keep it off the loop
+    await asyncio.to_thread(init_db)
+    await warm_pool()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
     print("✅ Database initialized!")
     
     # Warm cache with priority questions
     if cache_service.is_enabled():
         print("🔥 Warming question cache...")
-        import asyncio
-        asyncio.create_task(pregeneration_agent.warm_cache_on_startup())
+        _spawn_background(pregeneration_agent.warm_cache_on_startup(), name="warm_cache_on_startup")
         print("✅ Cache warming initiated!")
     else:
         print("⚠️  Redis cache disabled - questions will be generated in real-time")
 
 # Security functions
+
+# Recently verified (sha256(password), stored hash) pairs -> verification time.
+# In-process only; lets repeat logins skip bcrypt for a few minutes. Only
+# successes are cached, and a password change alters the stored hash.
+_VERIFIED_PASSWORDS: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+_VERIFIED_PASSWORDS_MAX = 1024
+_VERIFIED_PASSWORDS_TTL_SECONDS = 300
+
+def _verified_password_key(plain_password: str, hashed_password: str) -> Tuple[str, str]:
+    return (hashlib.sha256(plain_password.encode('utf-8')).hexdigest(), hashed_password)
+
+def _recently_verified(key: Tuple[str, str]) -> bool:
+    verified_at = _VERIFIED_PASSWORDS.get(key)
+    return verified_at is not None and time.monotonic() - verified_at < _VERIFIED_PASSWORDS_TTL_SECONDS
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
+    if not hashed_password:
+        return False
+    
+    key = _verified_password_key(plain_password, hashed_password)
+    if _recently_verified(key):
+        return True
+    
     try:
         password_byte = plain_password.encode('utf-8')
         hashed_password_byte = hashed_password.encode('utf-8')
-        return bcrypt.checkpw(password_byte, hashed_password_byte)
+        if not bcrypt.checkpw(password_byte, hashed_password_byte):
+            return False
     except Exception as e:
-        print(f"Password verification error: {e}")
+        logger.warning("Password verification error: %s", e)
         return False
-
-def get_password_hash(password: str) -> str:
-    """Hash password using bcrypt"""
-    pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(pwd_bytes, salt)
-    return hashed_password.decode('utf-8')
-
-# Initialize RAG Agent
-rag_agent = RAGAgent()
+    
+    _VERIFIED_PASSWORDS[key] = time.monotonic()
+    _VERIFIED_PASSWORDS.move_to_end(key)
+    while len(_VERIFIED_PASSWORDS) > _VERIFIED_PASSWORDS_MAX:
+        _VERIFIED_PASSWORDS.popitem(last=False)
+    return True
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify password without blocking the event loop
+    Cache hits answer inline; only an actual bcrypt check goes to the bcrypt pool
+    """
+    if _recently_verified(_verified_password_key(plain_password, hashed_password)):
+        return True
+    return await run_bcrypt(verify_password, plain_password, hashed_password)
 
 # ============================================================================
 # Pydantic Models (Request/Response)
 # ============================================================================
 
 class QuestionRequest(BaseModel):
+    model_config = API_MODEL_CONFIG
+
     subject: str
     difficulty: str
     count: int
@@ -104,13 +177,25 @@ class QuestionRequest(BaseModel):
     temperature: Optional[float] = None
 
 class QuestionResponse(BaseModel):
+    model_config = API_MODEL_CONFIG
+
     id: str
     text: str
     options: List[str]
     correctAnswer: int
     explanation: Optional[str] = None
 
+# Validates and serializes a whole question list in one pydantic-core pass
+# (extra keys such as subject/difficulty are dropped, as response_model did)
+_QUESTIONS_ADAPTER = TypeAdapter(List[QuestionResponse])
+
+def _questions_response(questions: List[dict]) -> Response:
+    body = _QUESTIONS_ADAPTER.dump_json(_QUESTIONS_ADAPTER.validate_python(questions))
+    return Response(content=body, media_type="application/json")
+
 class ExamResultSubmit(BaseModel):
+    model_config = API_MODEL_CONFIG
+
     username: str
     subject: str
     difficulty: str
@@ -118,15 +203,21 @@ class ExamResultSubmit(BaseModel):
     total_questions: int
 
 class UserCreate(BaseModel):
+    model_config = API_MODEL_CONFIG
+
     username: str  # Will be used as email
     password: str
     full_name: Optional[str] = None
 
 class UserLogin(BaseModel):
+    model_config = API_MODEL_CONFIG
+
     username: str  # Will be used as email
     password: str
 
 class Token(BaseModel):
+    model_config = API_MODEL_CONFIG
+
     access_token: str
     token_type: str
     username: str
@@ -136,41 +227,49 @@ class Token(BaseModel):
 # ============================================================================
 
 @app.post("/auth/signup")
-def signup(user: UserCreate, db: Session = Depends(get_db)):
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register new user"""
-    print(f"Signup attempt: {user.username}")
+    logger.debug("Signup attempt: %s", user.username)
     
-    # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user.username).first()
-    if existing_user:
+    # Check if user already exists; EXISTS stops at the first match and
+    # doesn't build a User object
+    if await db.scalar(EMAIL_TAKEN, {"email": user.username}):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    # bcrypt is CPU-bound; hash off the event loop
+    hashed_password = await run_bcrypt(get_password_hash, user.password)
     new_user = User(
         email=user.username,
         password_hash=hashed_password,
         full_name=user.full_name,
         role="student",
-        created_at=datetime.utcnow(),
         is_active=True
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     
-    print(f"✅ User created: {user.username}")
+    logger.info("User created: %s", user.username)
     return {"message": "User created successfully"}
 
 @app.post("/auth/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Login user"""
-    print(f"Login attempt: {user.username}")
+    logger.debug("Login attempt: %s", user.username)
+    
+    attempt_key = login_key(user.username, request)
+    if login_locked(attempt_key):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, try again later",
+            headers={"Retry-After": str(LOGIN_LOCKOUT_SECONDS)},
+        )
     
     # Find user
-    db_user = db.query(User).filter(User.email == user.username).first()
-    if not db_user:
+    db_user = (await db.execute(USER_BY_EMAIL, {"email": user.username})).scalar_one_or_none()
+    # Google-only accounts have no password hash; reject before any bcrypt work
+    if not db_user or not db_user.password_hash:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -178,18 +277,21 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
         )
     
     # Verify password
-    if not verify_password(user.password, db_user.password_hash):
+    if not await verify_password_async(user.password, db_user.password_hash):
+        record_login_failure(attempt_key)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    clear_login_failures(attempt_key)
+    
     # Update last login
-    db_user.last_login = datetime.utcnow()
-    db.commit()
+    db_user.last_login = utc_now()
+    await db.commit()
     
-    print(f"✅ Login successful: {user.username}")
+    logger.debug("Login successful: %s", user.username)
     return {
         "message": "Login successful", 
         "username": user.username, 
@@ -199,18 +301,20 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
     }
 
 class GoogleSignIn(BaseModel):
+    model_config = API_MODEL_CONFIG
+
     email: str
     name: Optional[str] = None
     google_id: str
 
 @app.post("/auth/google-signin")
-def google_signin(google_user: GoogleSignIn, db: Session = Depends(get_db)):
+async def google_signin(google_user: GoogleSignIn, db: AsyncSession = Depends(get_async_db)):
     """Handle Google OAuth sign-in"""
-    print(f"🔵 Google sign-in attempt: {google_user.email}")
+    logger.debug("Google sign-in attempt: %s", google_user.email)
     
     try:
         # Check if user exists
-        db_user = db.query(User).filter(User.email == google_user.email).first()
+        db_user = (await db.execute(USER_BY_EMAIL, {"email": google_user.email})).scalar_one_or_none()
         
         if db_user:
             # Update Google ID if not set
@@ -218,28 +322,26 @@ def google_signin(google_user: GoogleSignIn, db: Session = Depends(get_db)):
                 db_user.google_id = google_user.google_id
             
             # Update last login
-            db_user.last_login = datetime.utcnow()
-            db.commit()
+            db_user.last_login = utc_now()
+            await db.commit()
             
-            print(f"✅ Existing user logged in via Google: {google_user.email}")
+            logger.debug("Existing user logged in via Google: %s", google_user.email)
         else:
             # Create new user
             db_user = User(
                 email=google_user.email,
-                password_hash="",  # No password for OAuth users
+                password_hash=None,  # No password for OAuth users
                 full_name=google_user.name,
                 google_id=google_user.google_id,
                 role="student",
-                created_at=datetime.utcnow(),
-                last_login=datetime.utcnow(),
+                last_login=utc_now(),
                 is_active=True
             )
             
             db.add(db_user)
-            db.commit()
-            db.refresh(db_user)
+            await db.commit()
             
-            print(f"✅ New user created via Google: {google_user.email}")
+            logger.info("New user created via Google: %s", google_user.email)
         
         return {
             "message": "Google sign-in successful",
@@ -249,10 +351,8 @@ def google_signin(google_user: GoogleSignIn, db: Session = Depends(get_db)):
             "user_id": db_user.user_id
         }
     except Exception as e:
-        import traceback
-        print(f"❌ Google sign-in error: {str(e)}")
-        traceback.print_exc()
-        db.rollback()
+        logger.exception("Google sign-in error: %s", e)
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Google sign-in failed: {str(e)}")
 
 
@@ -264,8 +364,7 @@ def google_signin(google_user: GoogleSignIn, db: Session = Depends(get_db)):
 def get_exam_types():
     """Get all available exam types (IIT/JEE, NEET, EAMCET)"""
     try:
-        exam_types = ExamTypeService.get_all_exam_types()
-        return {"exam_types": exam_types}
+        return Response(content=ExamTypeService.get_all_exam_types_json(), media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -286,10 +385,10 @@ def get_exam_type(exam_type_id: str):
 def get_exam_subjects(exam_type_id: str):
     """Get subjects for a specific exam type"""
     try:
-        subjects = ExamTypeService.get_subjects_for_exam_type(exam_type_id)
-        if not subjects:
+        body = ExamTypeService.get_subjects_json(exam_type_id)
+        if body is None:
             raise HTTPException(status_code=404, detail="Exam type not found")
-        return {"exam_type": exam_type_id, "subjects": subjects}
+        return Response(content=body, media_type="application/json")
     except HTTPException:
         raise
     except Exception as e:
@@ -299,10 +398,14 @@ def get_exam_subjects(exam_type_id: str):
 def get_exam_syllabus(exam_type_id: str, subject: Optional[str] = None):
     """Get syllabus for exam type and optional subject"""
     try:
+        body = ExamTypeService.get_syllabus_json(exam_type_id, subject)
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+        
         syllabus = ExamTypeService.get_syllabus_for_exam_type(exam_type_id, subject)
         if not syllabus:
             raise HTTPException(status_code=404, detail="Syllabus not found")
-        return {"exam_type": exam_type_id, "syllabus": syllabus}
+        return {"exam_type": ExamTypeService.resolve_exam_type_id(exam_type_id), "syllabus": syllabus}
     except HTTPException:
         raise
     except Exception as e:
@@ -337,11 +440,9 @@ def create_exam(exam_type_id: str, db: Session = Depends(get_db)):
 def get_available_models():
     """Get all available AI models"""
     try:
-        models = ModelService.list_available_models()
-        return {
-            "models": models,
-            "default": ModelService.get_default_config()
-        }
+        # Only the bytes are cached: Response objects are per-request
+        # (middleware mutates their headers)
+        return Response(content=ModelService.get_models_json(), media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -362,8 +463,33 @@ def get_provider_models(provider: str):
 # Question Generation Endpoints
 # ============================================================================
 
+# cache_key -> running generation, for coalescing identical requests
+_inflight_generations: Dict[str, asyncio.Task] = {}
+
+# Strong references to fire-and-forget tasks; the loop only keeps weak ones
+_background_tasks: Set[asyncio.Task] = set()
+
+def _on_background_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    # Nobody awaits these tasks, so report failures here instead of
+    # leaving them to a "Task exception was never retrieved" at GC time
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task %s failed", task.get_name(), exc_info=task.exception())
+
+def _spawn_background(coro, name: Optional[str] = None):
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_background_done)
+
+async def _pregenerate_variants(subject: str, count: int, exam_type: str):
+    """Pre-generate the Easy and Hard variants of a Medium request together"""
+    await asyncio.gather(
+        pregeneration_agent._generate_and_cache(subject, "Easy", count, exam_type),
+        pregeneration_agent._generate_and_cache(subject, "Hard", count, exam_type)
+    )
+
 @app.post("/generate-questions", response_model=List[QuestionResponse])
-async def generate_questions(request: QuestionRequest):
+async def generate_questions(request: QuestionRequest, rag: RAGAgent = Depends(get_rag)):
     """Generate questions using RAG with optional model selection and caching"""
     try:
         # 1. Generate cache key
@@ -379,35 +505,44 @@ async def generate_questions(request: QuestionRequest):
         # 2. Check cache first
         cached_questions = cache_service.get_cached_questions(cache_key)
         if cached_questions:
-            print(f"⚡ INSTANT DELIVERY: Returning {len(cached_questions)} cached questions")
-            return cached_questions
+            logger.debug("Cache hit: returning %d cached questions", len(cached_questions))
+            return _questions_response(cached_questions)
         
-        # 3. Cache miss - generate in real-time
-        print(f"🔄 Cache miss - generating questions in real-time...")
-        questions = await rag_agent.generate_questions(
-            subject=request.subject,
-            difficulty=request.difficulty,
-            count=request.count,
-            exam_type=request.exam_type,
-            model_provider=request.model_provider,
-            model_name=request.model_name,
-            temperature=request.temperature
-        )
+        # 3. Cache miss - generate in real-time; identical concurrent
+        # requests share one generation instead of each calling the LLM
+        generation = _inflight_generations.get(cache_key)
+        is_leader = generation is None
+        if is_leader:
+            logger.debug("Cache miss - generating questions in real-time")
+            generation = asyncio.create_task(rag.generate_questions(
+                subject=request.subject,
+                difficulty=request.difficulty,
+                count=request.count,
+                exam_type=request.exam_type,
+                model_provider=request.model_provider,
+                model_name=request.model_name,
+                temperature=request.temperature
+            ))
+            _inflight_generations[cache_key] = generation
+            generation.add_done_callback(lambda _, key=cache_key: _inflight_generations.pop(key, None))
+        else:
+            logger.debug("Joining in-flight generation for %s", cache_key)
         
-        # 4. Store in cache for future requests
-        cache_service.set_cached_questions(cache_key, questions)
+        # Shielded so one disconnecting client doesn't cancel the others
+        questions = await asyncio.shield(generation)
         
-        # 5. Trigger background pre-generation for similar patterns
-        # (This helps pre-generate related difficulty levels)
-        if request.difficulty == "Medium":
-            asyncio.create_task(pregeneration_agent._generate_and_cache(
-                request.subject, "Easy", request.count, request.exam_type or "IIT_JEE"
-            ))
-            asyncio.create_task(pregeneration_agent._generate_and_cache(
-                request.subject, "Hard", request.count, request.exam_type or "IIT_JEE"
-            ))
+        if is_leader:
+            # 4. Store in cache for future requests
+            cache_service.set_cached_questions(cache_key, questions)
+            
+            # 5. Trigger background pre-generation for similar patterns
+            # (This helps pre-generate related difficulty levels)
+            if request.difficulty == "Medium":
+                _spawn_background(_pregenerate_variants(
+                    request.subject, request.count, request.exam_type or "IIT_JEE"
+                ))
         
-        return questions
+        return _questions_response(questions)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -416,111 +551,166 @@ async def generate_questions(request: QuestionRequest):
 # ============================================================================
 
 @app.post("/submit-exam")
-def submit_exam(result: ExamResultSubmit, db: Session = Depends(get_db)):
+async def submit_exam(result: ExamResultSubmit, db: AsyncSession = Depends(get_async_db)):
     """Submit exam results"""
-    print(f"📥 Received exam submission for: {result.username}")
+    logger.debug("Received exam submission for: %s", result.username)
     try:
-        # Find user
-        user = db.query(User).filter(User.email == result.username).first()
-        if not user:
-            print(f"❌ User not found: {result.username}")
-            raise HTTPException(status_code=404, detail=f"User {result.username} not found")
-        
-        print(f"👤 Found user: {user.user_id}, saving attempt...")
-        
         # For now, create a basic exam attempt record
         # TODO: Link to actual exam_id when exam management is implemented
-        exam_attempt = ExamAttempt(
-            user_id=user.user_id,
-            exam_id=None,  # Will be set when exam management is implemented
-            start_time=datetime.utcnow(),
-            end_time=datetime.utcnow(),
-            score=result.score,
-            total_questions=result.total_questions,
-            correct_answers=result.score,
-            incorrect_answers=result.total_questions - result.score,
-            unanswered=0,
-            status="completed"
-        )
-        
-        db.add(exam_attempt)
-        db.commit()
-        print(f"✅ Exam result saved successfully for {result.username}")
+        attempt_id = (await db.execute(INSERT_ATTEMPT_FOR_EMAIL, {
+            "email": result.username,
+            "score": result.score,
+            "total_questions": result.total_questions,
+            "incorrect_answers": result.total_questions - result.score,
+            "subject": result.subject,
+            "difficulty": result.difficulty
+        })).scalar_one_or_none()
+        if attempt_id is None:
+            logger.warning("Exam submission for unknown user: %s", result.username)
+            raise HTTPException(status_code=404, detail=f"User {result.username} not found")
+        await db.commit()
+        logger.debug("Exam result saved for %s", result.username)
         
         return {"message": "Exam result saved successfully"}
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        print(f"❌ Error saving exam result: {e}")
-        db.rollback()
+        logger.exception("Error saving exam result: %s", e)
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 # ============================================================================
 # Document Management Endpoints
 # ============================================================================
 
+# Document listing is cached briefly in Redis and dropped on every upload
+DOCUMENTS_CACHE_KEY = "docs:list"
+DOCUMENTS_CACHE_TTL = 30
+
+# Plain column rows, no ORM objects; labels match the response keys
+# and orjson writes datetimes in ISO format itself
+_DOCUMENTS_LIST = select(
+    StudyMaterial.material_id.label("id"),
+    StudyMaterial.title.label("filename"),
+    StudyMaterial.subject,
+    StudyMaterial.topic,  # This stores the exam_type
+    StudyMaterial.created_at.label("upload_date"),
+    StudyMaterial.status
+).order_by(StudyMaterial.created_at.desc())
+
 @app.get("/documents")
-async def get_documents(db: Session = Depends(get_db)):
+async def get_documents(db: AsyncSession = Depends(get_async_db)):
     """Get all uploaded documents"""
     try:
-        materials = db.query(StudyMaterial).order_by(StudyMaterial.created_at.desc()).all()
-        return [{
-            "id": m.material_id,
-            "filename": m.title,
-            "subject": m.subject,
-            "topic": m.topic,  # This stores the exam_type
-            "upload_date": m.created_at.isoformat() if m.created_at else None
-        } for m in materials]
+        cached = cache_service.get_cached_value(DOCUMENTS_CACHE_KEY)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+        
+        # Built in full (it is cached anyway), so a failed query is a clean 500
+        # rather than a truncated 200
+        rows = (await db.execute(_DOCUMENTS_LIST)).mappings()
+        body = orjson.dumps([dict(row) for row in rows])
+        cache_service.set_cached_value(DOCUMENTS_CACHE_KEY, body.decode(), DOCUMENTS_CACHE_TTL)
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/upload-document")
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MB
+# Readers accept the header anywhere in the first 1 KB
+PDF_MAGIC = b"%PDF-"
+
+async def _ingest_document(material_id: int, file_path: str, subject: str, filename: str):
+    """Index an uploaded file and record the outcome on its StudyMaterial row"""
+    global _index_stats_cache
+    try:
+        # PDF parsing + embedding in a worker thread
+        rag = await get_rag()
+        success = await asyncio.to_thread(rag.ingest_document, file_path, subject, filename)
+        status = "indexed" if success else "no_text"
+    except Exception:
+        logger.exception("Ingestion failed for %s", file_path)
+        status = "failed"
+    
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(StudyMaterial)
+            .where(StudyMaterial.material_id == material_id)
+            .values(status=status)
+        )
+        await db.commit()
+    cache_service.delete_cached_value(DOCUMENTS_CACHE_KEY)
+    
+    # New vectors were just indexed; don't serve the old counts
+    _index_stats_cache = None
+    logger.info("Ingestion of %s finished: %s", file_path, status)
+
+@app.post("/upload-document", status_code=202)
 async def upload_document(
     file: UploadFile = File(...), 
     subject: str = Form("mixed"),
     exam_type: str = Form("IIT_JEE"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Upload and process document"""
     try:
-        # Save file temporarily
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, file.filename)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Trigger RAG ingestion
-        success = rag_agent.ingest_document(file_path, subject)
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if PDF_MAGIC not in chunk[:1024]:
+            raise HTTPException(status_code=415, detail="Only PDF documents are supported")
         
-        if not success:
-            return {
-                "filename": file.filename,
-                "subject": subject,
-                "status": "warning",
-                "message": "File uploaded but no text extracted. This appears to be a scanned PDF."
-            }
+        # Stored under a random name: the client's filename is untrusted and
+        # may collide with an earlier upload; it's kept in the DB title only
+        ext = os.path.splitext(file.filename or "")[1].lower()
+        file_path = os.path.join(UPLOAD_DIR, f"{secrets.token_hex(8)}{ext}")
         
-        # Record in database
-        study_material = StudyMaterial(
-            title=file.filename,
-            description=f"Uploaded document for {subject} - {exam_type}",
-            file_url=file_path,
-            material_type="PDF",
-            subject=f"{exam_type}:{subject}",  # Store exam_type with subject
-            topic=exam_type,  # Store exam_type in topic field
-            exam_id=None,  # Will be set when exam management is implemented
-            uploaded_by=None,  # TODO: Get from authenticated user
-            created_at=datetime.utcnow()
-        )
+        # Copy to disk in 1 MB chunks without blocking the event loop. Bodies
+        # without a Content-Length get past limit_upload_size, so count here too
+        total = 0
+        try:
+            async with aiofiles.open(file_path, "wb") as buffer:
+                while chunk:
+                    total += len(chunk)
+                    if total > MAX_UPLOAD_BYTES:
+                        raise HTTPException(status_code=413, detail="File too large")
+                    await buffer.write(chunk)
+                    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            
+            # Record in database; indexing status is updated once ingestion finishes
+            study_material = StudyMaterial(
+                title=file.filename,
+                description=f"Uploaded document for {subject} - {exam_type}",
+                file_url=file_path,
+                material_type="PDF",
+                subject=f"{exam_type}:{subject}",  # Store exam_type with subject
+                topic=exam_type,  # Store exam_type in topic field
+                exam_id=None,  # Will be set when exam management is implemented
+                uploaded_by=None,  # TODO: Get from authenticated user
+                status="pending"
+            )
+            
+            db.add(study_material)
+            await db.commit()
+        except BaseException:
+            # Don't leave an orphaned file behind if the write or the commit fails
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            raise
+        cache_service.delete_cached_value(DOCUMENTS_CACHE_KEY)
         
-        db.add(study_material)
-        db.commit()
+        # Respond once the file is on disk; parsing and embedding take seconds
+        _spawn_background(_ingest_document(
+            study_material.material_id, file_path, subject, file.filename
+        ))
         
-        return {"filename": file.filename, "subject": subject, "status": "indexed successfully"}
+        return {
+            "id": study_material.material_id,
+            "filename": file.filename,
+            "subject": subject,
+            "status": "queued"
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -528,53 +718,58 @@ async def upload_document(
 # Admin Endpoints
 # ============================================================================
 
+_USER_ACTIVITY = (
+    select(
+        ExamAttempt.attempt_id,
+        ExamAttempt.score,
+        ExamAttempt.total_questions,
+        ExamAttempt.end_time
+    )
+    .where(ExamAttempt.user_id == bindparam("user_id"))
+    .order_by(ExamAttempt.end_time.desc())
+    .limit(bindparam("limit"))
+    .offset(bindparam("offset"))
+)
+
 @app.get("/admin/users")
-def get_users(db: Session = Depends(get_db)):
+async def get_users():
     """Get all users with activity stats"""
+    # Sent batch by batch as the cursor advances instead of built in memory
     try:
-        users = db.query(User).filter(User.role == "student").all()
-        
-        result = []
-        for user in users:
-            # Get exam count
-            exam_count = db.query(ExamAttempt).filter(ExamAttempt.user_id == user.user_id).count()
-            
-            # Get last activity
-            last_attempt = db.query(ExamAttempt).filter(
-                ExamAttempt.user_id == user.user_id
-            ).order_by(ExamAttempt.end_time.desc()).first()
-            
-            result.append({
-                "username": user.email,
-                "full_name": user.full_name,
-                "last_active": last_attempt.end_time.isoformat() if last_attempt and last_attempt.end_time else None,
-                "exams_taken": exam_count
-            })
-        
-        return result
+        return await json_array_response(STUDENT_STATS)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _activity_item(a) -> dict:
+    return {
+        "id": a["attempt_id"],
+        "subject": "N/A",  # TODO: Get from exam when implemented
+        "difficulty": "N/A",
+        "score": a["score"],
+        "total_questions": a["total_questions"],
+        "timestamp": a["end_time"]
+    }
+
 @app.get("/admin/user/{username}/activity")
-def get_user_activity(username: str, db: Session = Depends(get_db)):
-    """Get user activity history"""
+async def get_user_activity(
+    username: str,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get user activity history, newest first (paginated with limit/offset)"""
     try:
-        user = db.query(User).filter(User.email == username).first()
-        if not user:
+        user_id = await db.scalar(USER_ID_BY_EMAIL, {"email": username})
+        if user_id is None:
             raise HTTPException(status_code=404, detail="User not found")
         
-        attempts = db.query(ExamAttempt).filter(
-            ExamAttempt.user_id == user.user_id
-        ).order_by(ExamAttempt.end_time.desc()).all()
-        
-        return [{
-            "id": a.attempt_id,
-            "subject": "N/A",  # TODO: Get from exam when implemented
-            "difficulty": "N/A",
-            "score": a.score,
-            "total_questions": a.total_questions,
-            "timestamp": a.end_time.isoformat() if a.end_time else None
-        } for a in attempts]
+        # One page at most, so built in full; a failed query is a clean 500
+        attempts = await db.execute(
+            _USER_ACTIVITY, {"user_id": user_id, "limit": limit, "offset": offset}
+        )
+        return ORJSONResponse([_activity_item(a) for a in attempts.mappings()])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -596,12 +791,13 @@ async def warm_cache(
     subject: str,
     difficulty: str,
     count: int,
-    exam_type: Optional[str] = "IIT_JEE"
+    exam_type: Optional[str] = "IIT_JEE",
+    rag: RAGAgent = Depends(get_rag)
 ):
     """Admin endpoint to manually warm cache with specific configuration"""
     try:
         # Generate questions
-        questions = await rag_agent.generate_questions(
+        questions = await rag.generate_questions(
             subject=subject,
             difficulty=difficulty,
             count=count,
@@ -642,8 +838,7 @@ def invalidate_cache(pattern: str = "questions:*"):
 async def trigger_pregeneration():
     """Admin endpoint to trigger background pre-generation"""
     try:
-        import asyncio
-        asyncio.create_task(pregeneration_agent.warm_cache_on_startup())
+        _spawn_background(pregeneration_agent.warm_cache_on_startup(), name="trigger_pregeneration")
         return {
             "status": "success",
             "message": "Background pre-generation triggered"
@@ -655,11 +850,21 @@ async def trigger_pregeneration():
 # Debug Endpoints
 # ============================================================================
 
+# (fetched_at, serialized response) for /debug/index-stats; Pinecone stats
+# may be a minute stale, which saves a network round trip per dashboard poll
+_index_stats_cache: Optional[Tuple[float, bytes]] = None
+INDEX_STATS_TTL_SECONDS = 60
+
 @app.get("/debug/index-stats")
-def get_index_stats():
-    """Debug endpoint to check Pinecone index statistics"""
+def get_index_stats(force: bool = False):
+    """Debug endpoint to check Pinecone index statistics (?force=true bypasses the cache)"""
+    global _index_stats_cache
     try:
-        stats = rag_agent.index.describe_index_stats()
+        cached = _index_stats_cache
+        if not force and cached and time.monotonic() - cached[0] < INDEX_STATS_TTL_SECONDS:
+            return Response(content=cached[1], media_type="application/json")
+        
+        stats = get_rag_agent().index.describe_index_stats()
         stats_dict = {
             "total_vector_count": stats.total_vector_count,
             "dimension": getattr(stats, "dimension", 0),
@@ -669,11 +874,13 @@ def get_index_stats():
                 for k, v in stats.namespaces.items()
             }
         }
-        return {
+        body = orjson.dumps({
             "status": "success",
             "stats": stats_dict,
             "message": "Check the namespaces and total_vector_count"
-        }
+        })
+        _index_stats_cache = (time.monotonic(), body)
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -689,4 +896,16 @@ def read_root():
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", "8000"))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # One worker process per core, capped at 4 so the default DB pools fit a
+    # 100-connection Postgres (see POOL_OPTIONS in database.py; WEB_CONCURRENCY
+    # overrides). uvicorn's "auto"
+    # loop/http settings pick uvloop and httptools when installed
+    # (uvicorn[standard]) and fall back to asyncio/h11 on Windows.
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        workers=int(os.getenv("WEB_CONCURRENCY", str(min(os.cpu_count() or 1, 4)))),
+        # LOG_LEVEL=WARNING also silences uvicorn's per-request access log
+        log_level=os.getenv("LOG_LEVEL", "INFO").lower()
+    )
@@ -3,22 +3,41 @@ Updated FastAPI backend with PostgreSQL support
 Following PRD requirements for database structure
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, status, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, status, Form, Query, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-import shutil
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+from typing import List, Optional, Tuple
+from sqlalchemy import bindparam, func, literal_column, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects import postgresql  # noqa: F401  registers to_tsvector/plainto_tsquery
+import asyncio
 import os
+import time
+import logging
+import secrets
+import aiofiles
 import bcrypt
-from rag_service import RAGAgent
+import orjson
+from rag_service import RAGAgent, get_rag, get_rag_agent
+from api_common import (
+    API_MODEL_CONFIG, EMAIL_TAKEN, INSERT_ATTEMPT_FOR_EMAIL, STUDENT_STATS, USER_BY_EMAIL,
+    USER_ID_BY_EMAIL, get_password_hash, run_bcrypt
+)
+from json_stream import json_array_response
+from login_throttle import LOGIN_LOCKOUT_SECONDS, clear_login_failures, login_key, login_locked, record_login_failure
 from database import (
-    get_db, init_db, User, Exam, Question, ExamAttempt, 
+    get_async_db, init_db, warm_pool, utcnow, utc_now, AsyncSessionLocal, User, Exam, Question, ExamAttempt, 
     Answer, StudyMaterial, Subscription, Payment, Report
 )
 
-app = FastAPI(title="ExamAI RAG Backend - PostgreSQL")
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+logger = logging.getLogger(__name__)
+
+app = FastAPI(
+    title="ExamAI RAG Backend - PostgreSQL",
+    default_response_class=ORJSONResponse
+)
 
 # Configure CORS
 app.add_middleware(
@@ -29,51 +48,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Uploaded documents are written here (created at startup)
+UPLOAD_DIR = "uploads"
+
 # Initialize database on startup
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     print("🚀 Starting ExamAI Backend...")
-    init_db()
+    await asyncio.to_thread(init_db)
+    await warm_pool()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
     print("✅ Database initialized!")
 
 # Security functions
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
+    if not hashed_password:
+        return False
     try:
         password_byte = plain_password.encode('utf-8')
         hashed_password_byte = hashed_password.encode('utf-8')
         return bcrypt.checkpw(password_byte, hashed_password_byte)
     except Exception as e:
-        print(f"Password verification error: {e}")
+        logger.warning("Password verification error: %s", e)
         return False
 
-def get_password_hash(password: str) -> str:
-    """Hash password using bcrypt"""
-    pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(pwd_bytes, salt)
-    return hashed_password.decode('utf-8')
-
-# Initialize RAG Agent
-rag_agent = RAGAgent()
-
 # ============================================================================
 # Pydantic Models (Request/Response)
 # ============================================================================
 
 class QuestionRequest(BaseModel):
+    model_config = API_MODEL_CONFIG
+
     subject: str
     difficulty: str
     count: int
 
 class QuestionResponse(BaseModel):
+    model_config = API_MODEL_CONFIG
+
     id: str
     text: str
     options: List[str]
     correctAnswer: int
     explanation: Optional[str] = None
 
+# Validates and serializes a whole question list in one pydantic-core pass
+# (extra keys such as subject/difficulty are dropped, as response_model did)
+_QUESTIONS_ADAPTER = TypeAdapter(List[QuestionResponse])
+
 class ExamResultSubmit(BaseModel):
+    model_config = API_MODEL_CONFIG
+
     username: str
     subject: str
     difficulty: str
@@ -81,15 +108,21 @@ class ExamResultSubmit(BaseModel):
     total_questions: int
 
 class UserCreate(BaseModel):
+    model_config = API_MODEL_CONFIG
+
     username: str  # Will be used as email
     password: str
     full_name: Optional[str] = None
 
 class UserLogin(BaseModel):
+    model_config = API_MODEL_CONFIG
+
     username: str  # Will be used as email
     password: str
 
 class Token(BaseModel):
+    model_config = API_MODEL_CONFIG
+
     access_token: str
     token_type: str
     username: str
@@ -99,41 +132,49 @@ class Token(BaseModel):
 # ============================================================================
 
 @app.post("/auth/signup")
-def signup(user: UserCreate, db: Session = Depends(get_db)):
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register new user"""
-    print(f"Signup attempt: {user.username}")
+    logger.debug("Signup attempt: %s", user.username)
     
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user.username).first()
-    if existing_user:
+    # EXISTS stops at the first match and doesn't build a User object
+    if await db.scalar(EMAIL_TAKEN, {"email": user.username}):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    # bcrypt is CPU-bound; hash off the event loop
+    hashed_password = await run_bcrypt(get_password_hash, user.password)
     new_user = User(
         email=user.username,
         password_hash=hashed_password,
         full_name=user.full_name,
         role="student",
-        created_at=datetime.utcnow(),
         is_active=True
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     
-    print(f"✅ User created: {user.username}")
+    logger.info("User created: %s", user.username)
     return {"message": "User created successfully"}
 
 @app.post("/auth/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Login user"""
-    print(f"Login attempt: {user.username}")
+    logger.debug("Login attempt: %s", user.username)
+    
+    attempt_key = login_key(user.username, request)
+    if login_locked(attempt_key):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, try again later",
+            headers={"Retry-After": str(LOGIN_LOCKOUT_SECONDS)},
+        )
     
     # Find user
-    db_user = db.query(User).filter(User.email == user.username).first()
-    if not db_user:
+    db_user = (await db.execute(USER_BY_EMAIL, {"email": user.username})).scalar_one_or_none()
+    # Google-only accounts have no password hash; reject before any bcrypt work
+    if not db_user or not db_user.password_hash:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -141,18 +182,21 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
         )
     
     # Verify password
-    if not verify_password(user.password, db_user.password_hash):
+    if not await run_bcrypt(verify_password, user.password, db_user.password_hash):
+        record_login_failure(attempt_key)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    clear_login_failures(attempt_key)
+    
     # Update last login
-    db_user.last_login = datetime.utcnow()
-    db.commit()
+    db_user.last_login = utc_now()
+    await db.commit()
     
-    print(f"✅ Login successful: {user.username}")
+    logger.debug("Login successful: %s", user.username)
     return {"message": "Login successful", "username": user.username, "role": db_user.role}
 
 # ============================================================================
@@ -160,15 +204,16 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
 # ============================================================================
 
 @app.post("/generate-questions", response_model=List[QuestionResponse])
-def generate_questions(request: QuestionRequest):
+async def generate_questions(request: QuestionRequest, rag: RAGAgent = Depends(get_rag)):
     """Generate questions using RAG"""
     try:
-        questions = rag_agent.generate_questions(
+        questions = await rag.generate_questions(
             subject=request.subject,
             difficulty=request.difficulty,
             count=request.count
         )
-        return questions
+        body = _QUESTIONS_ADAPTER.dump_json(_QUESTIONS_ADAPTER.validate_python(questions))
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -177,33 +222,26 @@ def generate_questions(request: QuestionRequest):
 # ============================================================================
 
 @app.post("/submit-exam")
-def submit_exam(result: ExamResultSubmit, db: Session = Depends(get_db)):
+async def submit_exam(result: ExamResultSubmit, db: AsyncSession = Depends(get_async_db)):
     """Submit exam results"""
     try:
-        # Find user
-        user = db.query(User).filter(User.email == result.username).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # For now, create a basic exam attempt record
         # TODO: Link to actual exam_id when exam management is implemented
-        exam_attempt = ExamAttempt(
-            user_id=user.user_id,
-            exam_id=None,  # Will be set when exam management is implemented
-            start_time=datetime.utcnow(),
-            end_time=datetime.utcnow(),
-            score=result.score,
-            total_questions=result.total_questions,
-            correct_answers=result.score,
-            incorrect_answers=result.total_questions - result.score,
-            unanswered=0,
-            status="completed"
-        )
-        
-        db.add(exam_attempt)
-        db.commit()
+        attempt_id = (await db.execute(INSERT_ATTEMPT_FOR_EMAIL, {
+            "email": result.username,
+            "score": result.score,
+            "total_questions": result.total_questions,
+            "incorrect_answers": result.total_questions - result.score,
+            "subject": result.subject,
+            "difficulty": result.difficulty
+        })).scalar_one_or_none()
+        if attempt_id is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        await db.commit()
         
         return {"message": "Exam result saved successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -211,48 +249,142 @@ def submit_exam(result: ExamResultSubmit, db: Session = Depends(get_db)):
 # Document Management Endpoints
 # ============================================================================
 
+# (fetched_at, serialized response) for /documents; dropped on every upload
+_documents_cache: Optional[Tuple[float, bytes]] = None
+_documents_lock = asyncio.Lock()
+DOCUMENTS_CACHE_TTL_SECONDS = 5
+
+def _fresh(cached: Optional[Tuple[float, bytes]], ttl: float) -> Optional[bytes]:
+    if cached and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+    return None
+
 @app.get("/documents")
-async def get_documents(db: Session = Depends(get_db)):
+async def get_documents(db: AsyncSession = Depends(get_async_db)):
     """Get all uploaded documents"""
+    global _documents_cache
     try:
-        materials = db.query(StudyMaterial).order_by(StudyMaterial.created_at.desc()).all()
-        return [{
+        body = _fresh(_documents_cache, DOCUMENTS_CACHE_TTL_SECONDS)
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+        
+        # Concurrent misses wait for a single query instead of each running it
+        async with _documents_lock:
+            body = _fresh(_documents_cache, DOCUMENTS_CACHE_TTL_SECONDS)
+            if body is None:
+                body = await _query_documents(db)
+                _documents_cache = (time.monotonic(), body)
+        return Response(content=body, media_type="application/json")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _query_documents(db: AsyncSession) -> bytes:
+    result = await db.execute(
+        select(
+            StudyMaterial.material_id,
+            StudyMaterial.title,
+            StudyMaterial.subject,
+            StudyMaterial.created_at,
+            StudyMaterial.status
+        ).order_by(StudyMaterial.created_at.desc())
+    )
+    # orjson writes datetimes (and None) itself
+    return orjson.dumps([{
+        "id": m.material_id,
+        "filename": m.title,
+        "subject": m.subject,
+        "upload_date": m.created_at,
+        "status": m.status
+    } for m in result])
+
+# Must match idx_sm_fts (migrate_add_material_search_indexes.py) term for term,
+# so the constants are inlined rather than bound
+_MATERIAL_TSV = func.to_tsvector(
+    literal_column("'english'"),
+    StudyMaterial.title + literal_column("' '") + func.coalesce(StudyMaterial.description, literal_column("''"))
+)
+_SEARCH_DOCUMENTS = (
+    select(
+        StudyMaterial.material_id,
+        StudyMaterial.title,
+        StudyMaterial.subject,
+        StudyMaterial.created_at,
+        StudyMaterial.status
+    )
+    .where(
+        _MATERIAL_TSV.op("@@")(func.plainto_tsquery(literal_column("'english'"), bindparam("q")))
+        # Served by the pg_trgm index on subject
+        | StudyMaterial.subject.ilike(bindparam("pattern"))
+    )
+    .order_by(StudyMaterial.created_at.desc())
+    .limit(50)
+)
+
+@app.get("/documents/search")
+async def search_documents(q: str, db: AsyncSession = Depends(get_async_db)):
+    """Full-text search over document titles/descriptions, plus subject substring match"""
+    q = q.strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="Search query is required")
+    
+    try:
+        # Escape LIKE wildcards so they match literally
+        pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        result = await db.execute(_SEARCH_DOCUMENTS, {"q": q, "pattern": pattern})
+        return Response(content=orjson.dumps([{
             "id": m.material_id,
             "filename": m.title,
             "subject": m.subject,
-            "upload_date": m.created_at.isoformat() if m.created_at else None
-        } for m in materials]
+            "upload_date": m.created_at,
+            "status": m.status
+        } for m in result]), media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/upload-document")
+async def _ingest_and_record(material_id: int, file_path: str, subject: str, filename: str):
+    """Index an uploaded file after the response and record the outcome on its row"""
+    global _documents_cache, _index_stats_cache
+    try:
+        # PDF parsing + embedding in a worker thread
+        rag = await get_rag()
+        success = await asyncio.to_thread(rag.ingest_document, file_path, subject, filename)
+        status = "indexed" if success else "no_text"
+    except Exception:
+        logger.exception("Ingestion failed for %s", file_path)
+        status = "failed"
+    
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(StudyMaterial)
+            .where(StudyMaterial.material_id == material_id)
+            .values(status=status)
+        )
+        await db.commit()
+    
+    # New vectors were indexed; don't serve cached copies
+    _documents_cache = None
+    _index_stats_cache = None
+
+@app.post("/upload-document", status_code=202)
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...), 
     subject: str = Form("mixed"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Upload and process document"""
     try:
-        # Save file temporarily
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, file.filename)
+        # Stored under a random name: the client's filename is untrusted and
+        # may collide with an earlier upload; it's kept in the DB title only
+        ext = os.path.splitext(file.filename or "")[1].lower()
+        file_path = os.path.join(UPLOAD_DIR, f"{secrets.token_hex(8)}{ext}")
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Stream to disk in 1 MB chunks without blocking the event loop
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(1 << 20):
+                await buffer.write(chunk)
         
-        # Trigger RAG ingestion
-        success = rag_agent.ingest_document(file_path, subject)
-        
-        if not success:
-            return {
-                "filename": file.filename,
-                "subject": subject,
-                "status": "warning",
-                "message": "File uploaded but no text extracted. This appears to be a scanned PDF."
-            }
-        
-        # Record in database
+        # Record in database; indexing status is updated once ingestion finishes
         study_material = StudyMaterial(
             title=file.filename,
             description=f"Uploaded document for {subject}",
@@ -262,13 +394,26 @@ async def upload_document(
             topic=None,
             exam_id=None,  # Will be set when exam management is implemented
             uploaded_by=None,  # TODO: Get from authenticated user
-            created_at=datetime.utcnow()
+            status="pending"
         )
         
         db.add(study_material)
-        db.commit()
+        await db.commit()
+        
+        global _documents_cache
+        _documents_cache = None
         
-        return {"filename": file.filename, "subject": subject, "status": "indexed successfully"}
+        # Respond once the file is on disk; parsing and embedding run afterwards
+        background_tasks.add_task(
+            _ingest_and_record, study_material.material_id, file_path, subject, file.filename
+        )
+        
+        return {
+            "id": study_material.material_id,
+            "filename": file.filename,
+            "subject": subject,
+            "status": "queued"
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -277,52 +422,54 @@ async def upload_document(
 # ============================================================================
 
 @app.get("/admin/users")
-def get_users(db: Session = Depends(get_db)):
+async def get_users():
     """Get all users with activity stats"""
     try:
-        users = db.query(User).filter(User.role == "student").all()
-        
-        result = []
-        for user in users:
-            # Get exam count
-            exam_count = db.query(ExamAttempt).filter(ExamAttempt.user_id == user.user_id).count()
-            
-            # Get last activity
-            last_attempt = db.query(ExamAttempt).filter(
-                ExamAttempt.user_id == user.user_id
-            ).order_by(ExamAttempt.end_time.desc()).first()
-            
-            result.append({
-                "username": user.email,
-                "full_name": user.full_name,
-                "last_active": last_attempt.end_time.isoformat() if last_attempt and last_attempt.end_time else None,
-                "exams_taken": exam_count
-            })
-        
-        return result
+        return await json_array_response(STUDENT_STATS)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Walks ix_attempts_user_end newest first
+_USER_ACTIVITY = (
+    select(
+        ExamAttempt.attempt_id,
+        ExamAttempt.score,
+        ExamAttempt.total_questions,
+        ExamAttempt.end_time
+    )
+    .where(ExamAttempt.user_id == bindparam("user_id"))
+    .order_by(ExamAttempt.end_time.desc())
+    .limit(bindparam("limit"))
+    .offset(bindparam("offset"))
+)
+
 @app.get("/admin/user/{username}/activity")
-def get_user_activity(username: str, db: Session = Depends(get_db)):
-    """Get user activity history"""
+async def get_user_activity(
+    username: str,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get user activity history, newest first (paginated with limit/offset)"""
     try:
-        user = db.query(User).filter(User.email == username).first()
-        if not user:
+        user_id = await db.scalar(USER_ID_BY_EMAIL, {"email": username})
+        if user_id is None:
             raise HTTPException(status_code=404, detail="User not found")
         
-        attempts = db.query(ExamAttempt).filter(
-            ExamAttempt.user_id == user.user_id
-        ).order_by(ExamAttempt.end_time.desc()).all()
+        attempts = await db.execute(
+            _USER_ACTIVITY, {"user_id": user_id, "limit": limit, "offset": offset}
+        )
         
-        return [{
+        return ORJSONResponse([{
             "id": a.attempt_id,
             "subject": "N/A",  # TODO: Get from exam when implemented
             "difficulty": "N/A",
             "score": a.score,
             "total_questions": a.total_questions,
-            "timestamp": a.end_time.isoformat() if a.end_time else None
-        } for a in attempts]
+            "timestamp": a.end_time
+        } for a in attempts])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -330,11 +477,20 @@ def get_user_activity(username: str, db: Session = Depends(get_db)):
 # Debug Endpoints
 # ============================================================================
 
+# (fetched_at, serialized response) for /debug/index-stats
+_index_stats_cache: Optional[Tuple[float, bytes]] = None
+INDEX_STATS_TTL_SECONDS = 5
+
 @app.get("/debug/index-stats")
-def get_index_stats():
-    """Debug endpoint to check Pinecone index statistics"""
+def get_index_stats(force: bool = False):
+    """Debug endpoint to check Pinecone index statistics (?force=true bypasses the cache)"""
+    global _index_stats_cache
     try:
-        stats = rag_agent.index.describe_index_stats()
+        body = None if force else _fresh(_index_stats_cache, INDEX_STATS_TTL_SECONDS)
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+        
+        stats = get_rag_agent().index.describe_index_stats()
         stats_dict = {
             "total_vector_count": stats.total_vector_count,
             "dimension": getattr(stats, "dimension", 0),
@@ -344,11 +500,13 @@ def get_index_stats():
                 for k, v in stats.namespaces.items()
             }
         }
-        return {
+        body = orjson.dumps({
             "status": "success",
             "stats": stats_dict,
             "message": "Check the namespaces and total_vector_count"
-        }
+        })
+        _index_stats_cache = (time.monotonic(), body)
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -364,4 +522,16 @@ def read_root():
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", "8000"))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # One worker process per core, capped at 4 so the default DB pools fit a
+    # 100-connection Postgres (see POOL_OPTIONS in database.py; WEB_CONCURRENCY
+    # overrides). uvicorn's "auto"
+    # loop/http settings pick uvloop and httptools when installed
+    # (uvicorn[standard]) and fall back to asyncio/h11 on Windows.
+    uvicorn.run(
+        "main_postgres:app",
+        host="0.0.0.0",
+        port=port,
+        workers=int(os.getenv("WEB_CONCURRENCY", str(min(os.cpu_count() or 1, 4)))),
+        # LOG_LEVEL=WARNING also silences uvicorn's per-request access log
+        log_level=os.getenv("LOG_LEVEL", "INFO").lower()
+    )
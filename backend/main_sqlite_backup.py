@@ -2,11 +2,16 @@ from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, status, F
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
-import shutil
+import asyncio
+import logging
 import os
 import sqlite3
+import aiofiles
 import bcrypt
-from rag_service import RAGAgent
+from rag_service import get_rag_agent
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="ExamAI RAG Backend")
 
@@ -23,18 +28,15 @@ app.add_middleware(
 def verify_password(plain_password, hashed_password):
     password_byte = plain_password.encode('utf-8')
     hashed_password_byte = hashed_password.encode('utf-8')
-    print(f"Verifying: plain={plain_password}, hash={hashed_password}")
     try:
-        result = bcrypt.checkpw(password_byte, hashed_password_byte)
-        print(f"Verification result: {result}")
-        return result
+        return bcrypt.checkpw(password_byte, hashed_password_byte)
     except Exception as e:
-        print(f"Verification error: {e}")
+        logger.warning("Password verification error: %s", e)
         return False
 
 def get_password_hash(password):
     pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=int(os.getenv("BCRYPT_ROUNDS", "12")))
     hashed_password = bcrypt.hashpw(pwd_bytes, salt)
     return hashed_password.decode('utf-8')
 
@@ -77,10 +79,12 @@ def init_db():
     conn.commit()
     conn.close()
 
-init_db()
+@app.on_event("startup")
+async def startup_event():
+    # Schema check runs when the app is served, not whenever the module is imported
+    await asyncio.to_thread(init_db)
 
-# Initialize RAG Agent
-rag_agent = RAGAgent()
+# RAG agent is created on first use (rag_service.get_rag_agent)
 
 # Data Models
 class QuestionRequest(BaseModel):
@@ -177,26 +181,25 @@ def read_root():
 
 @app.post("/auth/signup")
 def signup(user: UserCreate):
-    print(f"Signup attempt: {user.username}")
+    logger.debug("Signup attempt: %s", user.username)
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
     try:
         hashed_password = get_password_hash(user.password)
-        print(f"Generated hash: {hashed_password}")
         c.execute("INSERT INTO users (username, password_hash, full_name) VALUES (?, ?, ?)",
                   (user.username, hashed_password, user.full_name))
         conn.commit()
-        print("User created successfully")
+        logger.debug("User created: %s", user.username)
         return {"message": "User created successfully"}
     except sqlite3.IntegrityError:
-        print("Username already registered")
+        logger.debug("Username already registered: %s", user.username)
         raise HTTPException(status_code=400, detail="Username already registered")
     finally:
         conn.close()
 
 @app.post("/auth/login")
 def login(user: UserLogin):
-    print(f"Login attempt: {user.username}")
+    logger.debug("Login attempt: %s", user.username)
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
     c.execute("SELECT password_hash FROM users WHERE username = ?", (user.username,))
@@ -204,29 +207,28 @@ def login(user: UserLogin):
     conn.close()
 
     if not result:
-        print("User not found")
+        logger.debug("User not found: %s", user.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    print(f"Found hash in DB: {result[0]}")
     if not verify_password(user.password, result[0]):
-        print("Password verification failed")
+        logger.debug("Password verification failed: %s", user.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    print("Login successful")
+    logger.debug("Login successful: %s", user.username)
     return {"message": "Login successful", "username": user.username}
 
 @app.post("/generate-questions", response_model=List[Question])
 def generate_questions(request: QuestionRequest):
     try:
-        questions = rag_agent.generate_questions(
+        questions = get_rag_agent().generate_questions(
             subject=request.subject,
             difficulty=request.difficulty,
             count=request.count
@@ -254,13 +256,15 @@ async def upload_document(file: UploadFile = File(...), subject: str = Form("mix
         # Save file temporarily
         upload_dir = "uploads"
         os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, file.filename)
+        file_path = os.path.join(upload_dir, os.path.basename(file.filename))
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Stream to disk in 1 MB chunks without blocking the event loop
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(1 << 20):
+                await buffer.write(chunk)
             
-        # Trigger RAG ingestion
-        success = rag_agent.ingest_document(file_path, subject)
+        # Trigger RAG ingestion (PDF parsing + embedding) in a worker thread
+        success = await asyncio.to_thread(get_rag_agent().ingest_document, file_path, subject)
         
         if not success:
             return {
@@ -285,7 +289,7 @@ async def upload_document(file: UploadFile = File(...), subject: str = Form("mix
 def get_index_stats():
     """Debug endpoint to check Pinecone index statistics"""
     try:
-        stats = rag_agent.index.describe_index_stats()
+        stats = get_rag_agent().index.describe_index_stats()
         # Convert to dict to avoid recursion error in FastAPI/Pydantic on Py3.14
         stats_dict = {
             "total_vector_count": stats.total_vector_count,
@@ -302,13 +306,11 @@ def get_index_stats():
             "message": "Check the namespaces and total_vector_count to see what's in your index"
         }
     except Exception as e:
-        print(f"Error fetching index stats: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error fetching index stats")
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
     import uvicorn
     # Use PORT environment variable if set, otherwise default to 8000
     port = int(os.getenv("PORT", "8000"))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    uvicorn.run(app, host="0.0.0.0", port=port, log_level=os.getenv("LOG_LEVEL", "INFO").lower())
@@ -0,0 +1,42 @@
+"""
+Database migration script to add indexes for the admin activity and documents views
+Run this script to update your existing database schema
+"""
+
+import os
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///exam_app.db")
+
+NEW_INDEXES = {
+    "ix_attempts_user_end": "exam_attempts (user_id, end_time DESC)",
+    "ix_materials_created": "study_materials (created_at DESC)",
+}
+
+def migrate_add_activity_indexes():
+    """Create the ordered indexes used by user activity and document listings"""
+    engine = create_engine(DATABASE_URL, echo=True)
+    
+    try:
+        with engine.connect() as conn:
+            for index_name, index_target in NEW_INDEXES.items():
+                print(f"Ensuring index {index_name}...")
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {index_target}"))
+            
+            conn.commit()
+            print("✅ Indexes are in place!")
+                    
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        raise
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    print("🚀 Starting database migration...")
+    print(f"Database: {DATABASE_URL}")
+    migrate_add_activity_indexes()
+    print("✅ Migration completed!")
@@ -0,0 +1,70 @@
+"""
+Database migration script to add subject/difficulty tracking to exam attempts
+Adds the columns plus the indexes used by pattern analysis and per-user lookups
+Run this script to update your existing database schema
+"""
+
+import os
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///exam_app.db")
+
+NEW_COLUMNS = {
+    "subject": "VARCHAR(255)",
+    "difficulty": "VARCHAR(50)",
+}
+
+NEW_INDEXES = {
+    "ix_attempts_time_subj_diff": "exam_attempts (start_time, subject, difficulty, total_questions)",
+    "ix_attempts_user_status": "exam_attempts (user_id, status)",
+}
+
+def migrate_add_attempt_subject_difficulty():
+    """Add subject/difficulty columns and supporting indexes to exam_attempts"""
+    engine = create_engine(DATABASE_URL, echo=True)
+    
+    try:
+        with engine.connect() as conn:
+            # Find existing columns
+            if 'postgresql' in DATABASE_URL:
+                # PostgreSQL
+                result = conn.execute(text("""
+                    SELECT column_name 
+                    FROM information_schema.columns 
+                    WHERE table_name='exam_attempts'
+                """))
+                columns = [row[0] for row in result.fetchall()]
+            else:
+                # SQLite
+                result = conn.execute(text("PRAGMA table_info(exam_attempts)"))
+                columns = [row[1] for row in result.fetchall()]
+            
+            for column, column_type in NEW_COLUMNS.items():
+                if column not in columns:
+                    print(f"Adding {column} column to exam_attempts table...")
+                    conn.execute(text(f"ALTER TABLE exam_attempts ADD COLUMN {column} {column_type}"))
+                    print(f"✅ {column} column added successfully!")
+                else:
+                    print(f"ℹ️  {column} column already exists, skipping")
+            
+            for index_name, index_target in NEW_INDEXES.items():
+                print(f"Ensuring index {index_name}...")
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {index_target}"))
+            
+            conn.commit()
+            print("✅ Indexes are in place!")
+                    
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        raise
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    print("🚀 Starting database migration...")
+    print(f"Database: {DATABASE_URL}")
+    migrate_add_attempt_subject_difficulty()
+    print("✅ Migration completed!")
@@ -0,0 +1,56 @@
+"""
+Database migration script to add full-text and trigram indexes for document search
+Run this script to update your existing database schema (PostgreSQL only)
+"""
+
+import os
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///exam_app.db")
+
+# The FTS expression must stay identical to _MATERIAL_TSV in main_postgres.py
+NEW_INDEXES = {
+    "idx_sm_fts": "study_materials USING GIN "
+                  "(to_tsvector('english', title || ' ' || coalesce(description, '')))",
+    "idx_sm_subject_trgm": "study_materials USING GIN (subject gin_trgm_ops)",
+}
+
+def migrate_add_material_search_indexes():
+    """Create the GIN indexes used by /documents/search"""
+    # SQLAlchemy no longer accepts the Heroku-style "postgres://" scheme
+    url = DATABASE_URL
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    
+    engine = create_engine(url, echo=True)
+    if engine.dialect.name != "postgresql":
+        print("⚠️  Search indexes need PostgreSQL; nothing to do")
+        engine.dispose()
+        return
+    
+    try:
+        with engine.connect() as conn:
+            print("Ensuring pg_trgm extension...")
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            
+            for index_name, index_target in NEW_INDEXES.items():
+                print(f"Ensuring index {index_name}...")
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {index_target}"))
+            
+            conn.commit()
+            print("✅ Indexes are in place!")
+                    
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        raise
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    print("🚀 Starting database migration...")
+    print(f"Database: {DATABASE_URL}")
+    migrate_add_material_search_indexes()
+    print("✅ Migration completed!")
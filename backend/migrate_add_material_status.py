@@ -0,0 +1,53 @@
+"""
+Database migration script to add indexing status to study materials
+Existing rows were indexed before being recorded, so they are marked 'indexed'
+Run this script to update your existing database schema
+"""
+
+import os
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///exam_app.db")
+
+def migrate_add_material_status():
+    """Add status column to study_materials table"""
+    engine = create_engine(DATABASE_URL, echo=True)
+    
+    try:
+        with engine.connect() as conn:
+            # Find existing columns
+            if 'postgresql' in DATABASE_URL:
+                # PostgreSQL
+                result = conn.execute(text("""
+                    SELECT column_name 
+                    FROM information_schema.columns 
+                    WHERE table_name='study_materials'
+                """))
+                columns = [row[0] for row in result.fetchall()]
+            else:
+                # SQLite
+                result = conn.execute(text("PRAGMA table_info(study_materials)"))
+                columns = [row[1] for row in result.fetchall()]
+            
+            if 'status' not in columns:
+                print("Adding status column to study_materials table...")
+                conn.execute(text("ALTER TABLE study_materials ADD COLUMN status VARCHAR(50) DEFAULT 'indexed'"))
+                conn.commit()
+                print("✅ status column added successfully!")
+            else:
+                print("ℹ️  status column already exists, skipping")
+                    
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        raise
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    print("🚀 Starting database migration...")
+    print(f"Database: {DATABASE_URL}")
+    migrate_add_material_status()
+    print("✅ Migration completed!")
@@ -0,0 +1,88 @@
+"""
+Database migration script to make users.password_hash nullable
+Google OAuth users have no password; they get NULL instead of an empty string
+Run this script to update your existing database schema
+"""
+
+import os
+import re
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///exam_app.db")
+
+def _rebuild_sqlite_users(conn):
+    """
+    SQLite can't drop NOT NULL in place: recreate users from its own
+    CREATE TABLE statement minus the constraint, copy the rows, and
+    restore the indexes
+    """
+    table_sql = conn.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='users'"
+    )).scalar_one()
+    index_sqls = conn.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name='users' AND sql IS NOT NULL"
+    )).scalars().all()
+    
+    new_sql, replaced = re.subn(
+        r"(password_hash\s+[A-Z]+(?:\s*\(\d+\))?)\s+NOT NULL", r"\1", table_sql, count=1, flags=re.IGNORECASE
+    )
+    if not replaced:
+        raise RuntimeError("Could not find the password_hash NOT NULL constraint in the users table")
+    new_sql = re.sub(r"^CREATE TABLE\s+\"?users\"?", "CREATE TABLE users_new", new_sql, count=1, flags=re.IGNORECASE)
+    
+    # Foreign keys aren't enforced on this engine (no PRAGMA foreign_keys),
+    # so rows referencing users survive the drop and rename
+    conn.execute(text(new_sql))
+    conn.execute(text("INSERT INTO users_new SELECT * FROM users"))
+    conn.execute(text("DROP TABLE users"))
+    conn.execute(text("ALTER TABLE users_new RENAME TO users"))
+    for index_sql in index_sqls:
+        conn.execute(text(index_sql))
+
+def migrate_password_hash_nullable():
+    """Drop NOT NULL from users.password_hash and clear the OAuth placeholders"""
+    engine = create_engine(DATABASE_URL, echo=True)
+    
+    try:
+        with engine.connect() as conn:
+            if engine.dialect.name == "postgresql":
+                result = conn.execute(text("""
+                    SELECT is_nullable
+                    FROM information_schema.columns
+                    WHERE table_name='users' AND column_name='password_hash'
+                """))
+                not_null = result.scalar_one() == "NO"
+            else:
+                # SQLite
+                result = conn.execute(text("PRAGMA table_info(users)"))
+                not_null = any(row[1] == "password_hash" and row[3] for row in result.fetchall())
+            
+            if not_null:
+                print("Making users.password_hash nullable...")
+                if engine.dialect.name == "postgresql":
+                    conn.execute(text("ALTER TABLE users ALTER COLUMN password_hash DROP NOT NULL"))
+                else:
+                    _rebuild_sqlite_users(conn)
+                print("✅ password_hash is now nullable!")
+            else:
+                print("ℹ️  password_hash is already nullable, skipping")
+            
+            # Google sign-ins used to store an empty string
+            result = conn.execute(text("UPDATE users SET password_hash = NULL WHERE password_hash = ''"))
+            print(f"✅ Cleared {result.rowcount} empty password hashes")
+            conn.commit()
+    
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        raise
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    print("🚀 Starting database migration...")
+    print(f"Database: {DATABASE_URL}")
+    migrate_password_hash_nullable()
+    print("✅ Migration completed!")
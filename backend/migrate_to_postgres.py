@@ -3,65 +3,238 @@ Migration script to transfer data from SQLite to PostgreSQL
 Run this after setting up PostgreSQL database
 """
 
+import csv
+import io
+import os
 import sqlite3
-from database import SessionLocal, User, init_db
-from datetime import datetime
-import bcrypt
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sqlalchemy import exists, insert, select, text
+from database import SessionLocal, User, engine, init_db, utcnow
 
-def migrate_users():
-    """Migrate users from SQLite to PostgreSQL"""
-    print("\n📦 Migrating users...")
+# Rows per COPY / executemany INSERT
+MIGRATION_BATCH_SIZE = 5000
+
+# Processes copying disjoint rowid ranges in parallel (1 = single transaction)
+MIGRATION_WORKERS = int(os.getenv("MIGRATION_WORKERS", "1"))
+
+# Sort/hash memory for the load transactions and the index rebuild (PostgreSQL)
+MIGRATION_WORK_MEM = os.getenv("MIGRATION_WORK_MEM", "256MB")
+
+# Every column the ORM would fill, since COPY doesn't apply Python-side defaults
+USER_COPY_COLUMNS = ("email", "password_hash", "full_name", "role", "created_at", "updated_at", "is_active")
+
+def _insert_users(db, users):
+    """Write one batch of user rows: COPY on PostgreSQL, executemany INSERT elsewhere"""
+    if db.get_bind().dialect.name != "postgresql":
+        db.execute(insert(User.__table__), users)
+        return
+    
+    # COPY loads the whole batch as one command, with no per-row INSERT
+    # parsing or planning. psycopg2 has no binary row writer, so use CSV
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for user in users:
+        writer.writerow([user[column] for column in USER_COPY_COLUMNS])
+    buffer.seek(0)
     
-    # Connect to SQLite
+    # The session's own connection, so the COPY shares its transaction
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY users ({', '.join(USER_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+def _fetch_batches(cursor, batch_size: int = MIGRATION_BATCH_SIZE):
+    """Yield rows from an executed cursor batch_size at a time"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+
+def _migrate_user_range(bounds) -> int:
+    """
+    Copy the SQLite users whose rowid falls in [low, high] in one Postgres transaction
+    Runs inline or in a worker process; returns the number of users written
+    """
+    low, high = bounds
     sqlite_conn = sqlite3.connect("exam_app.db")
     sqlite_conn.row_factory = sqlite3.Row
     cursor = sqlite_conn.cursor()
     
-    # Get all users from SQLite
-    cursor.execute("SELECT * FROM users")
-    sqlite_users = cursor.fetchall()
-    
-    if not sqlite_users:
-        print("⚠️  No users found in SQLite database")
-        sqlite_conn.close()
-        return
-    
     # Connect to PostgreSQL
     db = SessionLocal()
     
     try:
+        if db.get_bind().dialect.name == "postgresql":
+            # The load is one transaction that can simply be rerun, so don't
+            # wait for the WAL flush at commit. SET LOCAL ends with the
+            # transaction and leaves other connections untouched
+            db.execute(text("SET LOCAL synchronous_commit = OFF"))
+            db.execute(text("SELECT set_config('work_mem', :mem, true)"), {"mem": MIGRATION_WORK_MEM})
+        
+        # Existing emails in one pre-pass instead of a query per user
+        # (SQLite usernames are a primary key, so ranges can't overlap)
+        existing_emails = set(db.scalars(select(User.email)))
+        
+        # Stream users from SQLite a batch at a time and write each batch as
+        # it is read, so memory stays bounded by the batch size
+        cursor.execute(
+            "SELECT username, password_hash, full_name FROM users WHERE rowid BETWEEN ? AND ?",
+            (low, high)
+        )
+        migrated_at = utcnow()
         migrated_count = 0
-        for sqlite_user in sqlite_users:
-            # Check if user already exists
-            existing_user = db.query(User).filter(User.email == sqlite_user['username']).first()
-            if existing_user:
-                print(f"⏭️  User {sqlite_user['username']} already exists, skipping...")
-                continue
+        for sqlite_users in _fetch_batches(cursor):
+            new_users = []
+            for sqlite_user in sqlite_users:
+                if sqlite_user['username'] in existing_emails:
+                    print(f"⏭️  User {sqlite_user['username']} already exists, skipping...")
+                    continue
+                
+                existing_emails.add(sqlite_user['username'])
+                new_users.append({
+                    "email": sqlite_user['username'],  # SQLite uses 'username', PostgreSQL uses 'email'
+                    "password_hash": sqlite_user['password_hash'],
+                    "full_name": sqlite_user['full_name'],
+                    "role": 'student',  # Default role
+                    "created_at": migrated_at,
+                    "updated_at": migrated_at,
+                    "is_active": True
+                })
+                print(f"✅ Migrated user: {sqlite_user['username']}")
             
-            # Create new user in PostgreSQL
-            new_user = User(
-                email=sqlite_user['username'],  # SQLite uses 'username', PostgreSQL uses 'email'
-                password_hash=sqlite_user['password_hash'],
-                full_name=sqlite_user['full_name'],
-                role='student',  # Default role
-                created_at=datetime.utcnow(),
-                is_active=True
-            )
-            db.add(new_user)
-            migrated_count += 1
-            print(f"✅ Migrated user: {sqlite_user['username']}")
+            # One bulk write per batch rather than one round trip per user
+            if new_users:
+                _insert_users(db, new_users)
+                migrated_count += len(new_users)
         
         db.commit()
-        print(f"\n✨ Successfully migrated {migrated_count} users!")
+        return migrated_count
         
     except Exception as e:
-        print(f"❌ Error during migration: {e}")
+        print(f"❌ Error migrating users {low}-{high}: {e}")
         db.rollback()
+        raise
     finally:
         db.close()
         sqlite_conn.close()
 
 
+def _drop_user_indexes() -> list:
+    """
+    Drop the secondary indexes on users so the bulk load doesn't maintain
+    them row by row; returns their definitions for _recreate_user_indexes.
+    Indexes backing a constraint (primary key, UNIQUE (google_id)) are kept.
+    """
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT i.relname, pg_get_indexdef(x.indexrelid)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = 'users'::regclass
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+        """)).all()
+        for name, _ in rows:
+            print(f"🗑️  Dropping index {name} for the bulk load...")
+            conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+        conn.commit()
+    return [definition for _, definition in rows]
+
+
+def _recreate_user_indexes(definitions: list):
+    """
+    Rebuild the indexes dropped by _drop_user_indexes. CONCURRENTLY doesn't
+    block writes to users, but can't run inside a transaction block
+    """
+    if not definitions:
+        return
+    
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SELECT set_config('maintenance_work_mem', :mem, false)"), {"mem": MIGRATION_WORK_MEM})
+        try:
+            for definition in definitions:
+                print(f"🔨 {definition}")
+                conn.execute(text(definition.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)))
+        finally:
+            # Session-level setting; don't hand it back to the pool
+            conn.execute(text("RESET maintenance_work_mem"))
+
+
+def _init_migration_worker():
+    """
+    Drop pooled connections inherited from the parent on fork (main() has
+    already used the engine), so each worker opens its own sockets; close=False
+    leaves the parent's connections alone
+    """
+    engine.dispose(close=False)
+
+
+def migrate_users(workers: int = MIGRATION_WORKERS):
+    """
+    Migrate users from SQLite to PostgreSQL
+    With workers > 1 the rowid range is split across that many processes, each
+    with its own connection and transaction; reruns skip users already copied
+    """
+    print("\n📦 Migrating users...")
+    
+    sqlite_conn = sqlite3.connect("exam_app.db")
+    try:
+        low, high = sqlite_conn.execute("SELECT MIN(rowid), MAX(rowid) FROM users").fetchone()
+    finally:
+        sqlite_conn.close()
+    
+    if low is None:
+        print("⚠️  No users found in SQLite database")
+        return
+    
+    # Don't start processes for ranges smaller than a batch
+    workers = max(1, min(workers, (high - low + 1) // MIGRATION_BATCH_SIZE))
+    migrated_count = 0
+    failed_ranges = []
+    
+    # Secondary indexes are rebuilt once after the load instead of updated
+    # per row. Duplicate emails are filtered in _migrate_user_range, and the
+    # unique index is rebuilt (and fails loudly) if any slipped in, so run
+    # this while the app isn't accepting signups
+    dropped_indexes = _drop_user_indexes() if engine.dialect.name == "postgresql" else []
+    try:
+        if workers == 1:
+            try:
+                migrated_count = _migrate_user_range((low, high))
+            except Exception:
+                failed_ranges.append((low, high))
+        else:
+            step = (high - low + workers) // workers
+            ranges = [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_migration_worker) as pool:
+                futures = {pool.submit(_migrate_user_range, bounds): bounds for bounds in ranges}
+                for future in as_completed(futures):
+                    try:
+                        migrated_count += future.result()
+                    except Exception:
+                        failed_ranges.append(futures[future])
+    finally:
+        # Restore the indexes even if some ranges failed
+        _recreate_user_indexes(dropped_indexes)
+    
+    if failed_ranges:
+        print(f"\n⚠️  Migrated {migrated_count} users, but these rowid ranges failed and were "
+              f"rolled back: {sorted(failed_ranges)}. Rerun to retry them (existing users are skipped).")
+        raise RuntimeError(f"{len(failed_ranges)} user range(s) failed to migrate")
+    
+    print(f"\n✨ Successfully migrated {migrated_count} users!")
+
+
+# bcrypt hash (cost 12) of the default admin password "admin123", generated
+# once offline so setup doesn't spend a full bcrypt round on a known value
+DEFAULT_ADMIN_PASSWORD_HASH = "$2b$12$q5TBBXthB5NO.BYtEHOo5uZzeZr7JqhQSw68WcdZAqRuaCs56/mha"
+
+
 def create_default_admin():
     """Create default admin user"""
     print("\n👤 Creating default admin user...")
@@ -70,21 +243,18 @@ def create_default_admin():
     
     try:
         # Check if admin already exists
-        admin = db.query(User).filter(User.email == "admin@exam.com").first()
-        if admin:
+        if db.scalar(select(exists().where(User.email == "admin@exam.com"))):
             print("⚠️  Admin user already exists")
             return
         
         # Create admin user
-        admin_password = "admin123"  # Change this in production!
-        hashed_password = bcrypt.hashpw(admin_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        
+        # Password is admin123 - change this in production!
         admin_user = User(
             email="admin@exam.com",
-            password_hash=hashed_password,
+            password_hash=DEFAULT_ADMIN_PASSWORD_HASH,
             full_name="System Administrator",
             role="admin",
-            created_at=datetime.utcnow(),
+            created_at=utcnow(),
             is_active=True
         )
         
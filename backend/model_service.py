@@ -4,17 +4,62 @@ Supports OpenAI, Google Gemini, and Anthropic Claude models
 """
 
 import os
-from typing import Optional, Dict, List, Any
+import functools
+import importlib
+import orjson
+from typing import TYPE_CHECKING, Optional, Dict, List, Any
 from dotenv import load_dotenv
 
-# LangChain imports
-from langchain_core.language_models import BaseChatModel
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_anthropic import ChatAnthropic
+# LangChain provider packages are imported on first use (see _provider_class)
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_openai import ChatOpenAI
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from langchain_anthropic import ChatAnthropic
 
 load_dotenv()
 
+# Env var holding each provider's API key
+API_KEY_VARS = {
+    "openai": "OPENAI_API_KEY",
+    "google": "GOOGLE_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY"
+}
+
+
+def _read_env() -> Dict[str, Any]:
+    """Parse the model-related environment once (see ModelService.reload_env)"""
+    return {
+        "api_key_configured": {provider: bool(os.getenv(var)) for provider, var in API_KEY_VARS.items()},
+        "default_config": {
+            "provider": os.getenv("DEFAULT_MODEL_PROVIDER", "openai"),
+            "model_name": os.getenv("DEFAULT_MODEL_NAME", "gpt-4o-mini"),
+            "temperature": float(os.getenv("DEFAULT_TEMPERATURE", "0.7"))
+        }
+    }
+
+
+_ENV_CACHE = _read_env()
+
+# Serialized /models body, built on first use from _ENV_CACHE; reset by reload_env
+_MODELS_JSON: Optional[bytes] = None
+
+# Imported provider classes by "module.ClassName"
+_PROVIDER_CLASSES: Dict[str, type] = {}
+
+
+def _provider_class(module_name: str, class_name: str) -> type:
+    """
+    Import a LangChain provider class on first use and cache it
+    Loading every provider SDK at import time costs seconds of startup and
+    fails outright when an unused provider's package isn't installed
+    """
+    key = f"{module_name}.{class_name}"
+    cls = _PROVIDER_CLASSES.get(key)
+    if cls is None:
+        cls = _PROVIDER_CLASSES[key] = getattr(importlib.import_module(module_name), class_name)
+    return cls
+
 
 class ModelService:
     """
@@ -48,9 +93,9 @@ class ModelService:
         model_name: Optional[str] = None,
         temperature: float = 0.7,
         **kwargs
-    ) -> BaseChatModel:
+    ) -> "BaseChatModel":
         """
-        Get a configured LLM instance.
+        Get a configured LLM instance (shared per provider/model/temperature/kwargs).
         
         Args:
             provider: Model provider (openai, google, anthropic)
@@ -76,6 +121,23 @@ class ModelService:
         if model_name is None:
             model_name = default_models.get(provider)
         
+        return ModelService._build_model(provider, model_name, temperature, frozenset(kwargs.items()))
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _build_model(
+        provider: str,
+        model_name: Optional[str],
+        temperature: float,
+        frozen_kwargs: frozenset
+    ) -> "BaseChatModel":
+        """
+        Construct (once per configuration) the client behind get_model.
+        Clients keep keep-alive HTTP connection pools, so reusing them saves
+        the TLS handshake and DNS lookup that a fresh client pays per request.
+        Errors are not cached, but an OpenAI fallback is, until clear_cache().
+        """
+        kwargs = dict(frozen_kwargs)
         print(f"🤖 Initializing {provider} model: {model_name}")
         
         try:
@@ -96,12 +158,18 @@ class ModelService:
             raise
     
     @staticmethod
-    def _get_openai_model(model_name: str, temperature: float, **kwargs) -> ChatOpenAI:
+    def clear_cache():
+        """Drop cached model clients (e.g. after changing API keys, or in tests)"""
+        ModelService._build_model.cache_clear()
+    
+    @staticmethod
+    def _get_openai_model(model_name: str, temperature: float, **kwargs) -> "ChatOpenAI":
         """Get OpenAI model instance"""
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
         
+        ChatOpenAI = _provider_class("langchain_openai", "ChatOpenAI")
         return ChatOpenAI(
             model=model_name,
             temperature=temperature,
@@ -110,12 +178,13 @@ class ModelService:
         )
     
     @staticmethod
-    def _get_google_model(model_name: str, temperature: float, **kwargs) -> ChatGoogleGenerativeAI:
+    def _get_google_model(model_name: str, temperature: float, **kwargs) -> "ChatGoogleGenerativeAI":
         """Get Google Gemini model instance"""
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment variables")
         
+        ChatGoogleGenerativeAI = _provider_class("langchain_google_genai", "ChatGoogleGenerativeAI")
         return ChatGoogleGenerativeAI(
             model=model_name,
             temperature=temperature,
@@ -124,12 +193,13 @@ class ModelService:
         )
     
     @staticmethod
-    def _get_anthropic_model(model_name: str, temperature: float, **kwargs) -> ChatAnthropic:
+    def _get_anthropic_model(model_name: str, temperature: float, **kwargs) -> "ChatAnthropic":
         """Get Anthropic Claude model instance"""
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
         
+        ChatAnthropic = _provider_class("langchain_anthropic", "ChatAnthropic")
         return ChatAnthropic(
             model=model_name,
             temperature=temperature,
@@ -156,6 +226,7 @@ class ModelService:
             if not api_key:
                 raise ValueError("OPENAI_API_KEY not found in environment variables")
             
+            OpenAIEmbeddings = _provider_class("langchain_openai", "OpenAIEmbeddings")
             return OpenAIEmbeddings(
                 model="text-embedding-3-small",
                 dimensions=384,
@@ -168,6 +239,7 @@ class ModelService:
             if not api_key:
                 raise ValueError("GOOGLE_API_KEY not found in environment variables")
             
+            GoogleGenerativeAIEmbeddings = _provider_class("langchain_google_genai", "GoogleGenerativeAIEmbeddings")
             return GoogleGenerativeAIEmbeddings(
                 model="models/embedding-001",
                 google_api_key=api_key,
@@ -185,29 +257,15 @@ class ModelService:
         Returns:
             Dictionary of providers and their available models
         """
-        result = {}
+        api_key_configured = _ENV_CACHE["api_key_configured"]
         
-        for provider, models in ModelService.AVAILABLE_MODELS.items():
-            # Check if API key is available
-            api_key_var = {
-                "openai": "OPENAI_API_KEY",
-                "google": "GOOGLE_API_KEY",
-                "anthropic": "ANTHROPIC_API_KEY"
-            }.get(provider)
-            
-            has_api_key = bool(os.getenv(api_key_var))
-            
+        result = {}
+        for provider, models in _MODELS_PAYLOAD.items():
+            has_api_key = api_key_configured.get(provider, False)
             result[provider] = {
                 "available": has_api_key,
                 "api_key_configured": has_api_key,
-                "models": [
-                    {
-                        "id": model_id,
-                        "name": info["name"],
-                        "description": info["description"]
-                    }
-                    for model_id, info in models.items()
-                ]
+                "models": models
             }
         
         return result
@@ -220,11 +278,32 @@ class ModelService:
         Returns:
             Dictionary with default provider, model, and temperature
         """
-        return {
-            "provider": os.getenv("DEFAULT_MODEL_PROVIDER", "openai"),
-            "model_name": os.getenv("DEFAULT_MODEL_NAME", "gpt-4o-mini"),
-            "temperature": float(os.getenv("DEFAULT_TEMPERATURE", "0.7"))
-        }
+        return dict(_ENV_CACHE["default_config"])
+    
+    @staticmethod
+    def get_models_json() -> bytes:
+        """
+        Get the pre-serialized /models response body.
+        Built once per environment snapshot; reload_env() invalidates it.
+        """
+        global _MODELS_JSON
+        if _MODELS_JSON is None:
+            _MODELS_JSON = orjson.dumps({
+                "models": ModelService.list_available_models(),
+                "default": ModelService.get_default_config()
+            })
+        return _MODELS_JSON
+    
+    @staticmethod
+    def reload_env():
+        """
+        Re-read API key presence and default model settings from the environment.
+        They are parsed once at import; call this after changing them at runtime.
+        """
+        global _ENV_CACHE, _MODELS_JSON
+        load_dotenv()
+        _ENV_CACHE = _read_env()
+        _MODELS_JSON = None
     
     @staticmethod
     def validate_model(provider: str, model_name: str) -> bool:
@@ -243,3 +322,14 @@ class ModelService:
             provider in ModelService.AVAILABLE_MODELS and
             model_name in ModelService.AVAILABLE_MODELS[provider]
         )
+
+
+# Per-provider model lists for list_available_models, built once from the
+# constant AVAILABLE_MODELS; shared between calls, so treat as read-only
+_MODELS_PAYLOAD: Dict[str, List[Dict[str, str]]] = {
+    provider: [
+        {"id": model_id, "name": info["name"], "description": info["description"]}
+        for model_id, info in models.items()
+    ]
+    for provider, models in ModelService.AVAILABLE_MODELS.items()
+}
@@ -4,6 +4,7 @@ Provides endpoints for student performance tracking and analytics
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import bindparam, exists, select
 from sqlalchemy.orm import Session
 from database import get_db, User
 from performance_service import PerformanceService
@@ -11,6 +12,15 @@ from typing import Optional
 
 router = APIRouter(prefix="/api/performance", tags=["performance"])
 
+_USER_EXISTS = select(exists().where(User.user_id == bindparam("user_id")))
+_USER_NAMES = select(User.email, User.full_name).where(User.user_id == bindparam("user_id"))
+
+
+def _require_user(user_id: int, db: Session):
+    """404 unless the user exists; an EXISTS probe, so no user row is loaded"""
+    if not db.scalar(_USER_EXISTS, {"user_id": user_id}):
+        raise HTTPException(status_code=404, detail="User not found")
+
 
 # ============================================================================
 # Performance Summary Endpoints
@@ -31,8 +41,8 @@ async def get_performance_summary(
         Performance summary with metrics
     """
     try:
-        # Verify user exists
-        user = db.query(User).filter(User.user_id == user_id).first()
+        # Verify user exists, loading only the columns the response needs
+        user = db.execute(_USER_NAMES, {"user_id": user_id}).first()
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -68,10 +78,7 @@ async def get_performance_timeline(
         Daily performance data
     """
     try:
-        # Verify user exists
-        user = db.query(User).filter(User.user_id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        _require_user(user_id, db)
         
         timeline_data = PerformanceService.get_performance_over_time(user_id, days, db)
         
@@ -107,10 +114,7 @@ async def get_peer_comparison(
         Peer comparison data including rank and percentile
     """
     try:
-        # Verify user exists
-        user = db.query(User).filter(User.user_id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        _require_user(user_id, db)
         
         comparison = PerformanceService.get_peer_comparison(user_id, db)
         
@@ -145,10 +149,7 @@ async def get_strengths_weaknesses(
         Strengths, weaknesses, and recommendations
     """
     try:
-        # Verify user exists
-        user = db.query(User).filter(User.user_id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        _require_user(user_id, db)
         
         analysis = PerformanceService.get_strengths_and_weaknesses(user_id, db)
         
@@ -185,10 +186,7 @@ async def get_recent_activity(
         List of recent exam attempts
     """
     try:
-        # Verify user exists
-        user = db.query(User).filter(User.user_id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        _require_user(user_id, db)
         
         activities = PerformanceService.get_recent_activity(user_id, limit, db)
         
@@ -223,10 +221,7 @@ async def get_subject_performance(
         Subject-wise performance data
     """
     try:
-        # Verify user exists
-        user = db.query(User).filter(User.user_id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        _require_user(user_id, db)
         
         summary = PerformanceService.get_user_performance_summary(user_id, db)
         
@@ -261,10 +256,7 @@ async def get_difficulty_performance(
         Difficulty-wise performance data
     """
     try:
-        # Verify user exists
-        user = db.query(User).filter(User.user_id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        _require_user(user_id, db)
         
         summary = PerformanceService.get_user_performance_summary(user_id, db)
         
@@ -299,8 +291,8 @@ async def get_dashboard_stats(
         Complete dashboard data
     """
     try:
-        # Verify user exists
-        user = db.query(User).filter(User.user_id == user_id).first()
+        # Verify user exists, loading only the columns the response needs
+        user = db.execute(_USER_NAMES, {"user_id": user_id}).first()
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -6,6 +6,8 @@ Provides instant question delivery by caching pre-generated questions
 import redis
 import json
 import hashlib
+import functools
+import logging
 import os
 from typing import List, Dict, Optional, Any
 from datetime import datetime, timedelta
@@ -13,6 +15,35 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1024)
+def _build_cache_key(
+    subject: str,
+    difficulty: str,
+    count: int,
+    exam_type: Optional[str],
+    model_provider: Optional[str],
+    model_name: Optional[str]
+) -> str:
+    """Normalize and hash a question-set configuration (memoized per config)"""
+    # Create a deterministic key from parameters
+    key_parts = [
+        subject.lower().strip(),
+        difficulty.lower().strip(),
+        str(count),
+        exam_type.lower().strip() if exam_type else "general",
+        model_provider.lower().strip() if model_provider else "default",
+        model_name.lower().strip() if model_name else "default"
+    ]
+    
+    # Create hash for shorter key
+    key_string = ":".join(key_parts)
+    key_hash = hashlib.md5(key_string.encode()).hexdigest()[:12]
+    
+    return f"questions:{key_hash}:{key_string}"
+
 
 class QuestionCacheService:
     def __init__(self):
@@ -56,21 +87,7 @@ class QuestionCacheService:
         Generate a unique cache key for question set
         Format: questions:{hash}
         """
-        # Create a deterministic key from parameters
-        key_parts = [
-            subject.lower().strip(),
-            difficulty.lower().strip(),
-            str(count),
-            exam_type.lower().strip() if exam_type else "general",
-            model_provider.lower().strip() if model_provider else "default",
-            model_name.lower().strip() if model_name else "default"
-        ]
-        
-        # Create hash for shorter key
-        key_string = ":".join(key_parts)
-        key_hash = hashlib.md5(key_string.encode()).hexdigest()[:12]
-        
-        return f"questions:{key_hash}:{key_string}"
+        return _build_cache_key(subject, difficulty, count, exam_type, model_provider, model_name)
     
     def get_cached_questions(self, cache_key: str) -> Optional[List[Dict[str, Any]]]:
         """
@@ -85,16 +102,30 @@ class QuestionCacheService:
             if cached_data:
                 # Update access metadata
                 self._update_access_metadata(cache_key, hit=True)
-                print(f"✅ CACHE HIT: {cache_key}")
+                logger.debug("✅ CACHE HIT: %s", cache_key)
                 return json.loads(cached_data)
             else:
                 self._update_access_metadata(cache_key, hit=False)
-                print(f"❌ CACHE MISS: {cache_key}")
+                logger.debug("❌ CACHE MISS: %s", cache_key)
                 return None
         except Exception as e:
             print(f"⚠️  Cache retrieval error: {e}")
             return None
     
+    def mget_cached(self, cache_keys: List[str]) -> List[bool]:
+        """
+        Check which cache keys are present using a single MGET round trip
+        Returns one flag per key; does not count towards hit/miss statistics
+        """
+        if not self.redis_client or not cache_keys:
+            return [False] * len(cache_keys)
+
+        try:
+            return [value is not None for value in self.redis_client.mget(cache_keys)]
+        except Exception as e:
+            print(f"⚠️  Cache batch lookup error: {e}")
+            return [False] * len(cache_keys)
+
     def set_cached_questions(
         self, 
         cache_key: str, 
@@ -116,12 +147,52 @@ class QuestionCacheService:
             # Store metadata
             self._store_metadata(cache_key, len(questions))
             
-            print(f"💾 CACHED: {cache_key} ({len(questions)} questions, TTL: {ttl}s)")
+            logger.debug("💾 CACHED: %s (%d questions, TTL: %ss)", cache_key, len(questions), ttl)
+            return True
+        except Exception as e:
+            print(f"⚠️  Cache storage error: {e}")
+            return False
+    
+    def get_cached_value(self, key: str) -> Optional[str]:
+        """
+        Get a raw string value (e.g. a serialized API response)
+        Returns None if not found or cache disabled
+        """
+        if not self.redis_client:
+            return None
+        
+        try:
+            return self.redis_client.get(key)
+        except Exception as e:
+            print(f"⚠️  Cache retrieval error: {e}")
+            return None
+    
+    def set_cached_value(self, key: str, value: str, ttl: int) -> bool:
+        """
+        Store a raw string value with TTL
+        Returns True if successful
+        """
+        if not self.redis_client:
+            return False
+        
+        try:
+            self.redis_client.setex(key, ttl, value)
             return True
         except Exception as e:
             print(f"⚠️  Cache storage error: {e}")
             return False
     
+    def delete_cached_value(self, key: str) -> bool:
+        """Delete a single key; cheaper than invalidate_cache's KEYS scan"""
+        if not self.redis_client:
+            return False
+        
+        try:
+            return bool(self.redis_client.delete(key))
+        except Exception as e:
+            print(f"⚠️  Cache invalidation error: {e}")
+            return False
+    
     def invalidate_cache(self, pattern: str = "questions:*") -> int:
         """
         Invalidate cache entries matching pattern
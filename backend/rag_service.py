@@ -1,5 +1,6 @@
 import os
 import json
+import functools
 from typing import List, Dict, Any, Optional
 from pinecone import Pinecone
 from langchain_openai import OpenAIEmbeddings
@@ -8,6 +9,7 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 import time
 import random
 import asyncio
+import logging
 from model_service import ModelService
 
 # OCR dependencies
@@ -30,6 +32,8 @@ for path in tesseract_paths:
 
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 class RAGAgent:
     def __init__(self):
         print("Initializing RAGAgent...")
@@ -61,6 +65,10 @@ class RAGAgent:
         
         # Model Service for multi-model support
         self.model_service = ModelService()
+        
+        # Caps concurrent LLM calls across all in-flight requests so the
+        # parallel batches don't overwhelm the upstream model API
+        self.llm_semaphore = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENT_LLM", "8")))
         print("RAGAgent initialization complete.")
 
     async def generate_questions(
@@ -82,16 +90,12 @@ class RAGAgent:
             model_name = model_name or default_config["model_name"]
             temperature = temperature if temperature is not None else default_config["temperature"]
         
-        print(f"\n{'='*60}")
-        print(f"QUESTION GENERATION REQUEST:")
-        print(f"  Exam Type: {exam_type or 'General'}")
-        print(f"  Subject: {subject}")
-        print(f"  Difficulty: {difficulty}")
-        print(f"  Count: {count}")
-        print(f"  Model: {model_provider}/{model_name}")
-        print(f"  Temperature: {temperature}")
-        print(f"  Mode: RAG-FIRST with LLM Fallback")
-        print(f"{'='*60}\n")
+        logger.info(
+            "Question generation request: exam_type=%s subject=%s difficulty=%s "
+            "count=%s model=%s/%s temperature=%s",
+            exam_type or "General", subject, difficulty, count,
+            model_provider, model_name, temperature
+        )
         
         # Perform retrieval once to get context for all batches
         try:
@@ -104,7 +108,7 @@ class RAGAgent:
                                "Maths Physics" if subject.lower() == "chemistry" else "other subjects"
                                
                 query_text = f"{difficulty} level {subject} concepts, problems, and theory. NOT {other_subjects}."
-                print(f"Querying Pinecone with: '{query_text}'")
+                logger.debug("Querying Pinecone with: %r", query_text)
                 
                 # Create embedding for the query
                 query_embedding = self.embeddings.embed_query(query_text)
@@ -140,7 +144,7 @@ class RAGAgent:
                     results['matches'] = selected_matches
                 
             except Exception as rag_error:
-                print(f"⚠️ RAG RETRIEVAL FAILED: {rag_error}")
+                logger.warning("⚠️ RAG RETRIEVAL FAILED: %s", rag_error)
                 results = {'matches': []}
             
             # Extract context
@@ -159,14 +163,14 @@ class RAGAgent:
             # Determine generation mode
             using_rag = bool(context_str)
             if not using_rag:
-                print("⚠️ RAG STATUS: NO CONTEXT AVAILABLE - SWITCHING TO LLM FALLBACK")
+                logger.info("⚠️ RAG STATUS: NO CONTEXT AVAILABLE - SWITCHING TO LLM FALLBACK")
             else:
-                print(f"✅ RAG STATUS: Using RAG CONTEXT ONLY ({len(contexts)} chunks)")
+                logger.info("✅ RAG STATUS: Using RAG CONTEXT ONLY (%d chunks)", len(contexts))
 
             # Batch Processing
             BATCH_SIZE = 5
             num_batches = (count + BATCH_SIZE - 1) // BATCH_SIZE
-            print(f"🚀 Starting parallel generation: {count} questions in {num_batches} batches...")
+            logger.debug("🚀 Starting parallel generation: %d questions in %d batches...", count, num_batches)
             
             tasks = []
             for i in range(num_batches):
@@ -199,13 +203,11 @@ class RAGAgent:
                 q['subject'] = subject
                 q['difficulty'] = difficulty
                 
-            print(f"✅ FINAL COMPLETE: Generated {len(all_questions)} questions in total")
+            logger.info("✅ FINAL COMPLETE: Generated %d questions in total", len(all_questions))
             return all_questions
 
         except Exception as e:
-            print(f"❌ GLOBAL ERROR in generate_questions: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ GLOBAL ERROR in generate_questions: %s", e)
             return [{
                 "id": "error",
                 "text": "Error generating questions. Please try again.",
@@ -255,14 +257,17 @@ class RAGAgent:
                 if re.search(pattern, question_text, re.IGNORECASE):
                     is_dependent = True
                     filtered_count += 1
-                    print(f"  🚫 Filtered dependent question: '{q.get('text', '')[:60]}...'")
+                    logger.debug("🚫 Filtered dependent question: %.60r", q.get('text', ''))
                     break
             
             if not is_dependent:
                 independent_questions.append(q)
         
         if filtered_count > 0:
-            print(f"  ✅ Filtered out {filtered_count} dependent questions, {len(independent_questions)} independent questions remain")
+            logger.info(
+                "✅ Filtered out %d dependent questions, %d independent questions remain",
+                filtered_count, len(independent_questions)
+            )
         
         return independent_questions
 
@@ -282,7 +287,7 @@ class RAGAgent:
             model_name=model_name,
             temperature=temperature
         )
-        print(f"  ⚡ Starting Batch {batch_num}/{total_batches} ({count} questions)...")
+        logger.debug("⚡ Starting Batch %d/%d (%d questions)...", batch_num, total_batches, count)
         max_attempts = 2
         
         for attempt in range(max_attempts):
@@ -342,7 +347,8 @@ Return a JSON array with EXACTLY {count} objects:
 ]
 """
                 # Call LLM Async
-                response = await llm.ainvoke(prompt)
+                async with self.llm_semaphore:
+                    response = await llm.ainvoke(prompt)
                 content = response.content.strip()
                 
                 # Clean markdown
@@ -354,11 +360,11 @@ Return a JSON array with EXACTLY {count} objects:
                 questions = json.loads(content)
                 
                 if len(questions) == count:
-                    print(f"  ✅ Batch {batch_num} success: {len(questions)} questions")
+                    logger.debug("✅ Batch %d success: %d questions", batch_num, len(questions))
                     return questions
                 
                 # If count mismatch, retry or simple fix
-                print(f"  ⚠️ Batch {batch_num} count mismatch: got {len(questions)}, wanted {count}")
+                logger.warning("⚠️ Batch %d count mismatch: got %d, wanted %d", batch_num, len(questions), count)
                 if len(questions) > count:
                     return questions[:count]
                 
@@ -371,12 +377,12 @@ Return a JSON array with EXACTLY {count} objects:
                 return questions
                 
             except Exception as e:
-                print(f"  ❌ Batch {batch_num} error (attempt {attempt+1}): {e}")
+                logger.warning("❌ Batch %d error (attempt %d): %s", batch_num, attempt + 1, e)
                 if attempt < max_attempts - 1:
                     continue
         
         # Determine failure fallback
-        print(f"  ❌ Batch {batch_num} failed all attempts.")
+        logger.error("❌ Batch %d failed all attempts.", batch_num)
         # Return fallback error questions to avoid crashing the whole generation
         return [{
             "text": f"Error generating question in batch {batch_num}",
@@ -385,8 +391,10 @@ Return a JSON array with EXACTLY {count} objects:
             "explanation": "Generation failed"
         }] * count
 
-    def ingest_document(self, file_path: str, subject: str):
+    def ingest_document(self, file_path: str, subject: str, source_name: Optional[str] = None):
+        """source_name is recorded as each chunk's source (defaults to the file's name)"""
         subject = subject.strip()
+        source_name = source_name or os.path.basename(file_path)
         print(f"\n{'='*60}")
         print(f"INGESTING DOCUMENT:")
         print(f"  File: {file_path}")
@@ -472,7 +480,7 @@ Return a JSON array with EXACTLY {count} objects:
                     # Clean up metadata
                     metadata = {
                         "text": chunk.page_content,
-                        "source": os.path.basename(file_path),
+                        "source": source_name,
                         "subject": subject.lower(),
                         "page": chunk.metadata.get("page", 0) + 1, # 1-based page number
                         "chunk_index": i+j
@@ -504,3 +512,24 @@ Return a JSON array with EXACTLY {count} objects:
             import traceback
             traceback.print_exc()
             raise
+
+
+@functools.lru_cache(maxsize=1)
+def get_rag_agent() -> RAGAgent:
+    """Get or create RAG agent singleton; Pinecone and embeddings are set up on first use"""
+    return RAGAgent()
+
+
+_rag_agent_init_lock = asyncio.Lock()
+
+async def get_rag() -> RAGAgent:
+    """
+    Async accessor (and FastAPI dependency) for the RAG agent singleton
+    The first call builds it in a worker thread so the Pinecone/OpenAI
+    handshakes don't block the event loop
+    """
+    if not get_rag_agent.cache_info().currsize:
+        async with _rag_agent_init_lock:
+            if not get_rag_agent.cache_info().currsize:
+                await asyncio.to_thread(get_rag_agent)
+    return get_rag_agent()
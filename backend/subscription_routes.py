@@ -3,9 +3,9 @@ Subscription API Routes
 Handles all subscription and payment related endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from database import get_db, User, Subscription, Payment
+from database import get_db, SessionLocal, User, Subscription, Payment
 from payment_service import payment_service
 from subscription_service import subscription_service
 from invoice_service import invoice_service
@@ -18,6 +18,30 @@ from fastapi.responses import FileResponse
 router = APIRouter(prefix="/api", tags=["subscription"])
 
 
+def generate_payment_invoice(payment_id: int, payment_data: dict, user_data: dict,
+                             subscription_data: dict):
+    """
+    Render the invoice PDF and link it to the payment
+    
+    Runs as a background task (in the threadpool) with its own session,
+    since the request's session is closed by then.
+    """
+    invoice_result = invoice_service.generate_invoice(
+        payment_data=payment_data,
+        user_data=user_data,
+        subscription_data=subscription_data
+    )
+    if not invoice_result["success"]:
+        print(f"⚠️  Invoice generation failed for payment {payment_id}: {invoice_result.get('error')}")
+        return
+    
+    with SessionLocal() as db:
+        payment = db.get(Payment, payment_id)
+        if payment:
+            payment.invoice_url = invoice_result["invoice_path"]
+            db.commit()
+
+
 # Pydantic models for request validation
 class CreateOrderRequest(BaseModel):
     user_id: int
@@ -108,7 +132,7 @@ async def create_payment_order(request: CreateOrderRequest, db: Session = Depend
     """
     try:
         # Validate user exists
-        user = db.query(User).filter(User.user_id == request.user_id).first()
+        user = db.get(User, request.user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -149,12 +173,17 @@ async def create_payment_order(request: CreateOrderRequest, db: Session = Depend
 
 
 @router.post("/payment/verify")
-async def verify_payment(request: VerifyPaymentRequest, db: Session = Depends(get_db)):
+async def verify_payment(
+    request: VerifyPaymentRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """
     Verify payment and activate subscription
     
     Args:
         request: Payment verification request with Razorpay details
+        background_tasks: Used to render the invoice after responding
         
     Returns:
         Subscription activation status
@@ -214,9 +243,11 @@ async def verify_payment(request: VerifyPaymentRequest, db: Session = Depends(ge
         payment.subscription_id = subscription_result["subscription"]["subscription_id"]
         db.commit()
         
-        # Generate invoice
-        user = db.query(User).filter(User.user_id == request.user_id).first()
-        invoice_result = invoice_service.generate_invoice(
+        # Generate invoice after the response is sent
+        user = db.get(User, request.user_id)
+        background_tasks.add_task(
+            generate_payment_invoice,
+            payment.payment_id,
             payment_data={
                 "payment_id": payment.payment_id,
                 "transaction_id": payment.transaction_id,
@@ -236,16 +267,12 @@ async def verify_payment(request: VerifyPaymentRequest, db: Session = Depends(ge
             }
         )
         
-        if invoice_result["success"]:
-            payment.invoice_url = invoice_result["invoice_path"]
-            db.commit()
-        
         return {
             "success": True,
             "message": "Payment verified and subscription activated",
             "subscription": subscription_result["subscription"],
             "payment_id": payment.payment_id,
-            "invoice_available": invoice_result["success"]
+            "invoice_status": "generating"
         }
     except HTTPException:
         raise
@@ -463,7 +490,7 @@ async def download_invoice(payment_id: int, db: Session = Depends(get_db)):
         PDF file
     """
     try:
-        payment = db.query(Payment).filter(Payment.payment_id == payment_id).first()
+        payment = db.get(Payment, payment_id)
         if not payment:
             raise HTTPException(status_code=404, detail="Payment not found")
         